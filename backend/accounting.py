@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from fastapi import WebSocketDisconnect
+
+from serialization import JsonCodec
+
+
+def session_digest(session_id: Optional[str]) -> Optional[str]:
+    """
+    Stands in for a session id in anything reported back over HTTP. The id
+    itself is what lets a client reattach to a session, so it is never shown.
+    """
+    if session_id is None:
+        return None
+    return hashlib.sha256(session_id.encode()).hexdigest()[:12]
+
+
+class QuotaExceeded(Exception):
+    """A connection went over one of its quotas and the work was refused"""
+
+
+@dataclass
+class Quotas:
+    cpu_seconds: Optional[float] = None  # Node run CPU time per window
+    bytes_in: Optional[int] = None  # Websocket bytes received per window
+    window: float = 60.0  # Seconds, cpu_seconds and bytes_in reset after each
+    max_in_flight: Optional[int] = None  # Concurrent node runs
+    max_retained_bytes: Optional[int] = None  # Results and node instances held
+    mode: str = "throttle"  # "throttle" delays work over a quota, "reject" refuses it
+
+
+class Metered:
+    """
+    Awaits a coroutine while adding the CPU time of each of its steps to a
+    callback. Steps are timed with the event loop thread's clock, so time
+    spent waiting, or working in other threads or processes, is not counted.
+    """
+
+    def __init__(self, awaitable, charge: Callable[[float], None]):
+        self.awaitable = awaitable
+        self.charge = charge
+
+    def __await__(self):
+        steps = self.awaitable.__await__()
+        value, error = None, None
+        while True:
+            start = time.thread_time()
+            try:
+                step = steps.throw(error) if error is not None else steps.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.charge(time.thread_time() - start)
+            try:
+                value, error = (yield step), None
+            except BaseException as e:  # Cancellation is passed on to the coroutine
+                value, error = None, e
+
+
+class ConnectionUsage:
+    """What one session has used, plus the quotas it is held to"""
+
+    def __init__(self, session_id: str, quotas: Quotas):
+        self.session_id = session_id
+        self.quotas = quotas
+        self.retained_size: Callable[[], int] = lambda: 0  # Set to graph.estimated_size
+        self.cpu_seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.messages_in = 0
+        self.node_runs = 0
+        self.in_flight = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.window_start = time.monotonic()
+        self.window_cpu = 0.0
+        self.window_bytes_in = 0
+        self.slots = (
+            asyncio.Semaphore(quotas.max_in_flight) if quotas.max_in_flight else None
+        )
+
+    def roll_window(self):
+        if time.monotonic() - self.window_start >= self.quotas.window:
+            self.window_start = time.monotonic()
+            self.window_cpu = 0.0
+            self.window_bytes_in = 0
+
+    def charge_cpu(self, seconds: float):
+        self.cpu_seconds += seconds
+        self.window_cpu += seconds
+
+    def record_in(self, size: int):
+        self.roll_window()
+        self.bytes_in += size
+        self.window_bytes_in += size
+        self.messages_in += 1
+
+    def over_quota(self) -> Optional[str]:
+        self.roll_window()
+        quotas = self.quotas
+        if quotas.cpu_seconds is not None and self.window_cpu > quotas.cpu_seconds:
+            return f"CPU quota of {quotas.cpu_seconds}s per {quotas.window:g}s used up"
+        if quotas.bytes_in is not None and self.window_bytes_in > quotas.bytes_in:
+            return f"Upload quota of {quotas.bytes_in} bytes per {quotas.window:g}s used up"
+        if (
+            quotas.max_retained_bytes is not None
+            and self.retained_size() > quotas.max_retained_bytes
+        ):
+            return f"Session holds more than {quotas.max_retained_bytes} bytes"
+        return None
+
+    async def admit(self):
+        """Waits until the session is back under its quotas, or raises in reject mode"""
+        reason = self.over_quota()
+        if reason is None:
+            return
+        if self.quotas.mode == "reject" or reason.startswith("Session holds"):
+            # Retained size only shrinks when the client changes its flow
+            self.rejected += 1
+            raise QuotaExceeded(reason)
+        self.throttled += 1
+        print(f"Throttling session {self.session_id}: {reason}")
+        while self.over_quota():
+            await asyncio.sleep(
+                max(0.1, self.window_start + self.quotas.window - time.monotonic())
+            )
+
+    async def run(self, awaitable):
+        """Runs a node execution against this session's quotas and usage"""
+        try:
+            await self.admit()
+            if self.slots:
+                await self.slots.acquire()
+        except BaseException:
+            awaitable.close()  # Never started
+            raise
+        self.in_flight += 1
+        self.node_runs += 1
+        try:
+            return await Metered(awaitable, self.charge_cpu)
+        finally:
+            self.in_flight -= 1
+            if self.slots:
+                self.slots.release()
+
+    def stats(self) -> Dict:
+        return {
+            "session": session_digest(self.session_id),
+            "cpu_seconds": round(self.cpu_seconds, 4),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "messages_in": self.messages_in,
+            "retained_bytes": self.retained_size(),
+            "node_runs": self.node_runs,
+            "in_flight": self.in_flight,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+        }
+
+
+class MeteredWebSocket:
+    """
+    Wraps a client websocket, encoding messages with the codec negotiated for
+    it and counting the bytes sent and received.
+    """
+
+    def __init__(self, websocket, usage: ConnectionUsage, codec=None):
+        self.websocket = websocket
+        self.usage = usage
+        self.codec = codec or JsonCodec()
+
+    async def receive_text(self) -> str:
+        text = await self.websocket.receive_text()
+        self.usage.record_in(len(text.encode()))
+        return text
+
+    async def receive_message(self):
+        """Receives and decodes one message, from either a text or a binary frame"""
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        data = message.get("bytes")
+        if data is None:
+            data = message.get("text") or ""
+            self.usage.record_in(len(data.encode()))
+        else:
+            self.usage.record_in(len(data))
+        return self.codec.decode(data)
+
+    async def send_json(self, data):
+        encoded = self.codec.encode(data)
+        if self.codec.binary:
+            self.usage.bytes_out += len(encoded)
+            await self.websocket.send_bytes(encoded)
+        else:
+            self.usage.bytes_out += len(encoded.encode())
+            await self.websocket.send_text(encoded)
+
+    def __getattr__(self, name):
+        return getattr(self.websocket, name)
+
+
+class Accounting:
+    """Usage of every session, for quotas and the admin endpoint"""
+
+    def __init__(self, quotas: Quotas):
+        self.quotas = quotas
+        self.usage: Dict[str, ConnectionUsage] = {}
+
+    def usage_for(self, session_id: str) -> ConnectionUsage:
+        if session_id not in self.usage:
+            self.usage[session_id] = ConnectionUsage(session_id, self.quotas)
+        return self.usage[session_id]
+
+    def forget(self, session_id: str):
+        self.usage.pop(session_id, None)
+
+    def heaviest(self, limit: int = 10, sort: str = "cpu_seconds") -> List[Dict]:
+        stats = [usage.stats() for usage in self.usage.values()]
+        if stats and sort not in stats[0]:
+            raise ValueError(f"Cannot sort by {sort}")
+        return sorted(stats, key=lambda s: s[sort], reverse=True)[:limit]
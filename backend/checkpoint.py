@@ -0,0 +1,119 @@
+import asyncio
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Set
+
+# Run ids name a directory, so nothing that could point outside the store
+RUN_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def check_run_id(run_id: str):
+    if not RUN_ID.match(run_id):
+        raise ValueError(f"Invalid run id {run_id!r}, use letters, digits, _ and -")
+
+
+class CheckpointStore:
+    """
+    Completed node outputs on disk, one directory per run id and one pickle
+    per node fingerprint, so a run interrupted by a restart can resume from
+    the nodes it already finished. Each pickle holds {"values", "widgets"},
+    the node's outputs and the widget values an output node last showed.
+    All file I/O runs in a thread.
+    """
+
+    def __init__(
+        self,
+        directory: str = "../user/checkpoints",
+        max_age: float = 24 * 3600,
+        max_runs: int = 100,
+    ):
+        self.directory = directory
+        self.max_age = max_age  # Seconds since a run was last written to
+        self.max_runs = max_runs  # Most recently written runs kept
+        self.saved = 0
+        self.loaded = 0
+
+    def run_dir(self, run_id: str) -> str:
+        check_run_id(run_id)
+        return os.path.join(self.directory, run_id)
+
+    def _save(self, run_id: str, fingerprint: str, checkpoint: Dict):
+        directory = self.run_dir(run_id)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(checkpoint, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, os.path.join(directory, f"{fingerprint}.pkl"))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    async def save(
+        self,
+        run_id: str,
+        fingerprint: str,
+        values: List[Any],
+        widgets: Optional[Dict] = None,
+    ):
+        checkpoint = {"values": values, "widgets": widgets or {}}
+        try:
+            await asyncio.to_thread(self._save, run_id, fingerprint, checkpoint)
+            self.saved += 1
+        except Exception as e:
+            # Unpicklable outputs just mean this node reruns on resume
+            print(f"Error checkpointing {fingerprint[:12]} of run {run_id}: {str(e)}")
+
+    def _completed(self, run_id: str) -> Set[str]:
+        directory = self.run_dir(run_id)
+        if not os.path.isdir(directory):
+            return set()
+        return {name[:-4] for name in os.listdir(directory) if name.endswith(".pkl")}
+
+    async def completed(self, run_id: str) -> Set[str]:
+        """Fingerprints of the nodes the run has checkpoints for"""
+        return await asyncio.to_thread(self._completed, run_id)
+
+    def _load(self, run_id: str, fingerprint: str) -> Dict:
+        with open(os.path.join(self.run_dir(run_id), f"{fingerprint}.pkl"), "rb") as f:
+            return pickle.load(f)
+
+    async def load(self, run_id: str, fingerprint: str) -> Optional[Dict]:
+        try:
+            checkpoint = await asyncio.to_thread(self._load, run_id, fingerprint)
+        except Exception as e:
+            print(f"Error loading checkpoint {fingerprint[:12]} of run {run_id}: {str(e)}")
+            return None
+        self.loaded += 1
+        return checkpoint
+
+    def _collect_garbage(self) -> int:
+        if not os.path.isdir(self.directory):
+            return 0
+        runs = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_dir()),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+        now = time.time()
+        removed = 0
+        for index, entry in enumerate(runs):
+            if index >= self.max_runs or now - entry.stat().st_mtime > self.max_age:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    async def collect_garbage(self) -> int:
+        """Removes expired runs and the oldest ones beyond max_runs"""
+        return await asyncio.to_thread(self._collect_garbage)
+
+    async def sweep(self, interval: float = 3600):
+        while True:
+            removed = await self.collect_garbage()
+            if removed:
+                print(f"Removed {removed} old checkpoint runs")
+            await asyncio.sleep(interval)
@@ -1,5 +1,12 @@
-from typing import Any
-from dataclasses import dataclass
+import asyncio
+import inspect
+import os
+from contextlib import nullcontext
+from typing import Any, List
+from dataclasses import dataclass, field
+
+# Where nodes write their files (SaveImage, SaveVideo, ...)
+OUTPUT_DIR = os.environ.get("NODER_OUTPUT_DIR", "../user/output")
 
 
 @dataclass
@@ -14,14 +21,38 @@ class CaptionedVideo:
     caption: str
 
 
+@dataclass
+class VideoStream:
+    """A video file plus the per-frame operations still to apply. Frames are
+    only decoded when a sink node streams them, see video.py"""
+
+    path: str
+    caption: str = ""
+    ops: List[str] = field(default_factory=list)
+    width: int = 0  # Only needed for raw frame files
+    height: int = 0
+
+
 class Node:
+    # Identical concurrent executions may share one result. Only for pure nodes:
+    # followers get the leader's outputs, files and handles included
+    deduplicate = False
+    local_only = False  # Never dispatch to remote workers
+    output_node = False  # Shows or saves results, so lazy runs always include it
+    retries = 0  # Extra attempts after a failure listed in retry_on
+    retry_backoff = 1.0  # Seconds before the first retry, doubled for each next one
+    retry_on = (Exception,)  # Failures worth retrying, e.g. (OSError, TimeoutError)
+    resources = {}  # Pool slots held while running, e.g. {"ollama": 1} or {"cpu": 1}
+    memory_estimate = 0  # Bytes a run needs, charged to the "memory" pool if there is one
+
     def __init__(self):
         self.instantiated = True
         self.node_id = None
         print(f"Node initialized {self.__class__.__name__}")
         self.widgets = []
         self.websocket = None
-        self.output_dir = "../user/output"  # TODO: Make this an env variable
+        self.message_listeners = []  # Async callables also receiving node messages
+        self.output_dir = OUTPUT_DIR
 
     async def send_message(self, message_type: str, data: dict):
         if self.websocket:
@@ -34,6 +65,8 @@ class Node:
                     },
                 }
             )
+        for listener in list(self.message_listeners):
+            await listener(message_type, data)
 
     async def set_status(self, status):
         """Update node's running status"""
@@ -52,10 +85,96 @@ class Node:
     async def run(self, *args, **kwargs) -> Any:
         pass
 
-    async def _run(self, *args, **kwargs):
-        await self.set_status("run_start")
-        result = await self.run(*args, **kwargs)
-        await self.set_status("run_complete")
+    def release(self):
+        """
+        Called when the node leaves its graph, removed from the canvas or its
+        session ended, to delete files or close handles the instance holds
+        """
+
+    @classmethod
+    def warmup(cls):
+        """
+        Runs once per class in a thread when its first node is added to a
+        canvas, for slow one-off setup such as heavy imports or loading a model
+        """
+
+    @classmethod
+    def supports_batch(cls) -> bool:
+        """Subclasses may define an async run_batch, a vectorized run: every input
+        arrives as a list of equal length and one result per element is returned."""
+        return callable(getattr(cls, "run_batch", None))
+
+    @classmethod
+    def returns_list(cls) -> bool:
+        """True when run is annotated to return a single List output"""
+        annotation = inspect.signature(cls.run).return_annotation
+        return getattr(annotation, "__origin__", None) is list
+
+    def _normalize_result(self, result):
+        if isinstance(result, list) and self.returns_list():
+            return [result]
         if isinstance(result, (tuple, list)):
             return result
         return [result] if result is not None else []
+
+    async def _retrying(self, call, slots=None):
+        """
+        Awaits call(), retrying failures in retry_on with exponential backoff.
+        slots() makes the async context held for each attempt, e.g. resource
+        and scheduler slots, so a backoff holds nothing other runs wait for.
+        """
+        attempt = 0
+        while True:
+            try:
+                async with slots() if slots else nullcontext():
+                    return await call()
+            except self.retry_on as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.retry_backoff * 2**attempt
+                attempt += 1
+                print(
+                    f"{self.__class__.__name__} failed ({str(e)}), "
+                    f"retry {attempt}/{self.retries} in {delay:g}s"
+                )
+                await self.set_status("retrying")
+                await asyncio.sleep(delay)
+
+    async def _call(self, function: str, args, kwargs, slots=None):
+        """Runs run or run_batch with retries, reporting its status"""
+        await self.set_status("run_start")
+        try:
+            result = await self._retrying(
+                lambda: getattr(self, function)(*args, **kwargs), slots
+            )
+        except Exception:
+            await self.set_status("run_failed")
+            raise
+        await self.set_status("run_complete")
+        if function == "run_batch":
+            return [self._normalize_result(element) for element in result]
+        return self._normalize_result(result)
+
+    async def _run(self, *args, **kwargs):
+        return await self._call("run", args, kwargs)
+
+    async def _run_batch(self, **kwargs):
+        return await self._call("run_batch", (), kwargs)
+
+
+class LoopNode(Node):
+    """
+    Closes a cycle in the graph. Inputs named in feedback_inputs receive the
+    value produced by the loop body and are not treated as dependencies, so the
+    graph runs the body in the backend until continue_loop returns False.
+    previous and current are this node's outputs before and after a body pass.
+    """
+
+    feedback_inputs = ("feedback",)
+    max_iterations = 1  # Usually set from a widget in run
+    # Loop state lives on this instance, so it must run here and every time
+    deduplicate = False
+    local_only = True
+
+    def continue_loop(self, iteration: int, previous: Any, current: Any) -> bool:
+        return iteration < self.max_iterations
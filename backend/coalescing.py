@@ -0,0 +1,72 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class FlowCoalescer:
+    """
+    Latest-wins queue for one connection's process_flow messages. A
+    submission waits until no newer one has arrived for debounce seconds,
+    and one arriving while another waits or a run is in progress replaces
+    the waiting one, so a burst of slider changes runs the newest flow once
+    instead of every flow in turn. Runs in progress are never interrupted.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Dict], Awaitable[Any]],
+        on_superseded: Optional[Callable[[Dict], Awaitable[Any]]] = None,
+        debounce: float = 0.05,
+    ):
+        self.run = run
+        self.on_superseded = on_superseded  # Gets each message dropped for a newer one
+        self.debounce = debounce
+        self.pending: Optional[Dict] = None
+        self.submitted_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.superseded = 0
+        self.failed = 0
+
+    async def submit(self, message: Dict):
+        self.submitted += 1
+        dropped, self.pending = self.pending, message
+        self.submitted_at = time.monotonic()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.drain())
+        if dropped is not None:
+            self.superseded += 1
+            if self.on_superseded:
+                await self.on_superseded(dropped)
+
+    async def drain(self):
+        while self.pending is not None:
+            quiet = time.monotonic() - self.submitted_at
+            if quiet < self.debounce:
+                await asyncio.sleep(self.debounce - quiet)
+                continue
+            message, self.pending = self.pending, None
+            try:
+                await self.run(message)
+            except Exception as e:
+                # One failed flow must not stop the messages after it
+                self.failed += 1
+                print(f"Error running coalesced flow: {str(e)}")
+
+    async def idle(self):
+        """Waits until every submission so far has run or been superseded"""
+        while self.task is not None and not self.task.done():
+            await asyncio.shield(self.task)
+
+    def cancel(self):
+        self.pending = None
+        if self.task:
+            self.task.cancel()
+
+    def stats(self) -> Dict:
+        return {
+            "submitted": self.submitted,
+            "superseded": self.superseded,
+            "failed": self.failed,
+            "pending": self.pending is not None,
+        }
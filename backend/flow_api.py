@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import serialization
+from validation import FlowValidationError
+
+
+def flow_key(flow: Dict) -> str:
+    """Identifies a flow's structure, ignoring widget values and layout"""
+    structure = (
+        sorted((n["id"], n.get("data", {}).get("label", "")) for n in flow["nodes"]),
+        sorted(
+            (e["source"], e.get("sourceHandle"), e["target"], e.get("targetHandle"))
+            for e in flow["edges"]
+        ),
+    )
+    return hashlib.sha256(json.dumps(structure).encode()).hexdigest()
+
+
+def apply_overrides(flow: Dict, overrides: Dict[str, Dict]) -> Dict:
+    """Overrides widget values, keyed by node id or node label"""
+    for node in flow["nodes"]:
+        data = node.setdefault("data", {})
+        for key in (node["id"], data.get("label")):
+            if key in overrides:
+                data.setdefault("widgetValues", {}).update(overrides[key])
+    return flow
+
+
+def select_outputs(graph, results: Dict, outputs: Optional[List[str]]) -> Dict:
+    """
+    Picks "node_id" (all outputs) or "node_id.output_name" entries from the
+    results, keyed by node id and output name.
+    """
+    selected = {}
+    for spec in outputs or list(results):
+        node_id, _, output_name = spec.partition(".")
+        node = graph.get_node_by_id(node_id)
+        outcome = graph.last_outcomes.get(node_id, {})
+        if outcome.get("status") in ("failed", "skipped"):
+            detail = outcome.get("error") or f"upstream node {outcome.get('cause')} failed"
+            raise HTTPException(status_code=500, detail=f"{spec} {outcome['status']}: {detail}")
+        if node is None or node_id not in results:
+            raise HTTPException(status_code=400, detail=f"No result for {spec}")
+        names = [out.get("name") for out in node.outputs]
+        values = results[node_id]
+        named = {
+            names[i] if i < len(names) else str(i): value
+            for i, value in enumerate(values)
+        }
+        if output_name:
+            if output_name not in named:
+                raise HTTPException(status_code=400, detail=f"No output {spec}")
+            named = {output_name: named[output_name]}
+        selected.setdefault(node_id, {}).update(named)
+    return jsonable_encoder(selected)
+
+
+class GraphPool:
+    """
+    Executes flows for HTTP callers on warm graphs. Idle graphs are kept per
+    flow structure so repeated calls reuse already instantiated nodes, and at
+    most max_concurrent flows run at once with max_queued more waiting.
+    """
+
+    def __init__(
+        self,
+        graph_factory: Callable,
+        max_concurrent: int = 8,
+        max_queued: int = 64,
+        max_idle_per_flow: int = 4,
+        max_flows: int = 32,
+    ):
+        self.graph_factory = graph_factory
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.max_queued = max_queued
+        self.max_idle_per_flow = max_idle_per_flow
+        self.max_flows = max_flows
+        self.idle: "OrderedDict[str, List]" = OrderedDict()
+        self.waiting = 0
+
+    def checkout(self, key: str):
+        graphs = self.idle.get(key)
+        if graphs:
+            self.idle.move_to_end(key)
+            return graphs.pop()
+        return self.graph_factory()
+
+    def checkin(self, key: str, graph):
+        graphs = self.idle.setdefault(key, [])
+        self.idle.move_to_end(key)
+        if len(graphs) < self.max_idle_per_flow:
+            graphs.append(graph)
+        else:
+            graph.close()
+        while len(self.idle) > self.max_flows:
+            for dropped in self.idle.popitem(last=False)[1]:
+                dropped.close()
+
+    async def prewarm(self, flow: Dict):
+        """Instantiates a flow's nodes ahead of the first call"""
+        graph = self.graph_factory()
+        await graph.update_from_json(flow)
+        await graph.warmed(graph.nodes)
+        self.checkin(flow_key(flow), graph)
+
+    def enqueue(self):
+        """Counts a caller as waiting for a slot, or refuses it when the queue is full"""
+        if self.waiting >= self.max_queued:
+            raise HTTPException(status_code=429, detail="Too many queued flow runs")
+        self.waiting += 1
+
+    async def execute(
+        self, flow: Dict, outputs: Optional[List[str]] = None, enqueued: bool = False
+    ) -> Dict:
+        """Runs a flow once a slot is free. enqueued means enqueue was already called"""
+        if not enqueued:
+            self.enqueue()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        key = flow_key(flow)
+        graph = self.checkout(key)
+        try:
+            await graph.update_from_json(flow)
+            retain = [spec.partition(".")[0] for spec in outputs or []]
+            results = await graph.execute_nodes(retain=retain)
+            return select_outputs(graph, results, outputs)
+        finally:
+            self.checkin(key, graph)
+            self.semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "waiting": self.waiting,
+            "idle_graphs": sum(len(graphs) for graphs in self.idle.values()),
+            "flows": len(self.idle),
+        }
+
+
+class JobStore:
+    """Background flow runs submitted over HTTP, kept until max_finished newer ones finish"""
+
+    def __init__(self, pool: GraphPool, max_finished: int = 256):
+        self.pool = pool
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self.tasks = set()
+
+    def submit(self, flow: Dict, outputs: Optional[List[str]]) -> str:
+        # Queued jobs take their place in the pool's queue now, so a full
+        # queue refuses the submission instead of failing the job later
+        self.pool.enqueue()
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "status": "queued", "submitted": time.time()}
+        self.jobs[job_id] = job
+        task = asyncio.create_task(self.run(job, flow, outputs))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job_id
+
+    async def run(self, job: Dict, flow: Dict, outputs):
+        job["status"] = "running"
+        try:
+            job["result"] = await self.pool.execute(flow, outputs, enqueued=True)
+            job["status"] = "done"
+        except HTTPException as e:
+            job["status"], job["error"] = "error", str(e.detail)
+        except Exception as e:
+            job["status"], job["error"] = "error", str(e)
+        job["finished"] = time.time()
+        finished = [j for j in self.jobs.values() if "finished" in j]
+        for old in finished[: max(0, len(finished) - self.max_finished)]:
+            del self.jobs[old["id"]]
+
+    def get(self, job_id: str) -> Dict:
+        if job_id not in self.jobs:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        return self.jobs[job_id]
+
+
+def load_flow_request(body: Dict, saved_flows_dir: str) -> Dict:
+    """Builds the flow to run from {"flow": ...} or {"saved_flow": name, "overrides": ...}"""
+    if "flow" in body:
+        flow = body["flow"]
+    elif "saved_flow" in body:
+        path = os.path.join(saved_flows_dir, os.path.basename(body["saved_flow"]))
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="Saved flow not found")
+        flow = serialization.load_flow(path)
+    else:
+        raise HTTPException(status_code=400, detail="Expected flow or saved_flow")
+    if not isinstance(flow, dict) or "nodes" not in flow or "edges" not in flow:
+        raise HTTPException(status_code=400, detail="Invalid flow format")
+    return apply_overrides(flow, body.get("overrides", {}))
+
+
+def create_flow_router(pool: GraphPool, saved_flows_dir: str) -> APIRouter:
+    router = APIRouter(prefix="/api")
+    jobs = JobStore(pool)
+
+    async def run_request(body: Dict):
+        flow = load_flow_request(body, saved_flows_dir)
+        try:
+            return await pool.execute(flow, body.get("outputs"))
+        except FlowValidationError as e:
+            raise HTTPException(status_code=422, detail=e.problems)
+
+    @router.post("/flows/run")
+    async def run_flow(body: Dict):
+        """Runs a flow and returns the selected outputs, or a job id when async is set"""
+        if body.get("async"):
+            return await submit_job(body)
+        return {"status": "success", "outputs": await run_request(body)}
+
+    @router.post("/jobs")
+    async def submit_job(body: Dict):
+        flow = load_flow_request(body, saved_flows_dir)
+        job_id = jobs.submit(flow, body.get("outputs"))
+        return JSONResponse(
+            content={"status": "success", "job_id": job_id}, status_code=202
+        )
+
+    @router.get("/jobs/{job_id}")
+    async def job_status(job_id: str):
+        job = jobs.get(job_id)
+        return {k: v for k, v in job.items() if k != "result"}
+
+    @router.get("/jobs/{job_id}/result")
+    async def job_result(job_id: str):
+        job = jobs.get(job_id)
+        if job["status"] == "error":
+            raise HTTPException(status_code=500, detail=job["error"])
+        if job["status"] != "done":
+            raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+        return {"status": "success", "outputs": job["result"]}
+
+    @router.get("/stats")
+    async def api_stats():
+        return {"status": "success", "pool": pool.stats()}
+
+    return router
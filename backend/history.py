@@ -0,0 +1,346 @@
+"""
+Execution history kept in SQLite, and latency regression checks on it.
+
+Graphs hand each finished run to HistoryStore.record, which only appends it
+to a list; a background task writes the pending runs in batches from a
+thread and prunes old ones now and then.
+
+    python history.py regressions --threshold 1.5
+    python history.py runs --limit 20
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from accounting import session_digest
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    session_id TEXT,  -- Digest only, the id itself lets a client reattach
+    flow TEXT,
+    kind TEXT,
+    started REAL,
+    duration REAL,
+    status TEXT,
+    node_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS node_runs (
+    run INTEGER REFERENCES runs(id) ON DELETE CASCADE,
+    node_id TEXT,
+    class TEXT,
+    function TEXT,
+    started REAL,
+    duration REAL,
+    input_bytes INTEGER,
+    output_bytes INTEGER,
+    cache_hit INTEGER,
+    status TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS node_runs_class ON node_runs(class, started);
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class HistoryStore:
+    """
+    Runs and their node executions, kept for max_age seconds and at most
+    max_runs runs. Recording never blocks the event loop: runs wait in
+    memory, up to max_pending, until the writer task stores them.
+    """
+
+    def __init__(
+        self,
+        path: str = "../user/history.db",
+        max_age: float = 30 * 24 * 3600,
+        max_runs: int = 10000,
+        flush_interval: float = 1.0,
+        max_pending: int = 1000,
+        prune_interval: float = 600,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.max_runs = max_runs
+        self.flush_interval = flush_interval  # Seconds pending runs may wait
+        self.max_pending = max_pending  # Runs beyond this are dropped, not queued
+        self.prune_interval = prune_interval
+        self.pending: List[Dict] = []
+        self.task = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.stopping = False
+        self.last_prune = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.write_loop())
+
+    def record(
+        self,
+        kind: str,
+        nodes: List[Dict],
+        started: float,
+        duration: float,
+        status: str,
+        run_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        flow: Optional[str] = None,
+    ):
+        """
+        Queues a finished run. kind is "flow" for execute_nodes or "node" for
+        execute_node; nodes holds one dict per node execution with node_id,
+        class, function, started, duration, input_bytes, output_bytes,
+        cache_hit, status and error.
+        """
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self.start()
+        self.pending.append(
+            {
+                "run_id": run_id,
+                "session_id": session_digest(session_id),
+                "flow": flow,
+                "kind": kind,
+                "started": started,
+                "duration": duration,
+                "status": status,
+                "nodes": nodes,
+            }
+        )
+        if len(self.pending) >= self.max_pending // 2:
+            self.wakeup.set()
+
+    async def write_loop(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        prune = time.monotonic() - self.last_prune >= self.prune_interval
+        try:
+            await asyncio.to_thread(self.write_batch, batch, prune)
+            self.written += len(batch)
+            self.batches += 1
+            if prune:
+                self.last_prune = time.monotonic()
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"Error writing {len(batch)} runs to history: {str(e)}")
+
+    def write_batch(self, batch: List[Dict], prune: bool = False):
+        connection = connect(self.path)
+        try:
+            with connection:
+                for run in batch:
+                    cursor = connection.execute(
+                        "INSERT INTO runs (run_id, session_id, flow, kind, started,"
+                        " duration, status, node_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            run["run_id"],
+                            run["session_id"],
+                            run["flow"],
+                            run["kind"],
+                            run["started"],
+                            run["duration"],
+                            run["status"],
+                            len(run["nodes"]),
+                        ),
+                    )
+                    connection.executemany(
+                        "INSERT INTO node_runs (run, node_id, class, function, started,"
+                        " duration, input_bytes, output_bytes, cache_hit, status, error)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                cursor.lastrowid,
+                                node["node_id"],
+                                node["class"],
+                                node.get("function", "run"),
+                                node["started"],
+                                node["duration"],
+                                node.get("input_bytes"),
+                                node.get("output_bytes"),
+                                int(node.get("cache_hit", False)),
+                                node["status"],
+                                node.get("error"),
+                            )
+                            for node in run["nodes"]
+                        ],
+                    )
+                if prune:
+                    self.prune(connection)
+        finally:
+            connection.close()
+
+    def prune(self, connection: sqlite3.Connection):
+        connection.execute("DELETE FROM runs WHERE started < ?", (time.time() - self.max_age,))
+        connection.execute(
+            "DELETE FROM runs WHERE id <= (SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (self.max_runs,),
+        )
+
+    async def close(self):
+        """Writes whatever is still pending"""
+        if self.task:
+            # Cancelling could interrupt a flush and lose its batch
+            self.stopping = True
+            self.wakeup.set()
+            await self.task
+            self.stopping = False
+        await self.flush()
+
+    async def regressions(self, **kwargs) -> List[Dict]:
+        return await asyncio.to_thread(find_regressions, self.path, **kwargs)
+
+    async def recent_runs(self, limit: int = 20) -> List[Dict]:
+        return await asyncio.to_thread(recent_runs, self.path, limit)
+
+    def stats(self) -> Dict:
+        return {
+            "pending": len(self.pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+
+def find_regressions(
+    path: str,
+    recent_hours: float = 24,
+    baseline_days: float = 14,
+    threshold: float = 1.5,
+    min_samples: int = 5,
+) -> List[Dict]:
+    """
+    Node classes whose median run time over the last recent_hours is at
+    least threshold times their median over the baseline_days before that.
+    Only successful executions that actually ran (no cache hits) count.
+    """
+    if not os.path.exists(path):
+        return []
+    now = time.time()
+    recent_start = now - recent_hours * 3600
+    baseline_start = recent_start - baseline_days * 24 * 3600
+    connection = connect(path)
+    try:
+        rows = connection.execute(
+            "SELECT class, started, duration FROM node_runs"
+            " WHERE status = 'success' AND cache_hit = 0 AND started >= ?",
+            (baseline_start,),
+        ).fetchall()
+    finally:
+        connection.close()
+
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    for class_name, started, duration in rows:
+        period = "recent" if started >= recent_start else "baseline"
+        samples.setdefault(class_name, {"recent": [], "baseline": []})[period].append(duration)
+
+    regressions = []
+    for class_name, periods in samples.items():
+        recent, baseline = periods["recent"], periods["baseline"]
+        if len(recent) < min_samples or len(baseline) < min_samples:
+            continue
+        recent_median = statistics.median(recent)
+        baseline_median = statistics.median(baseline)
+        ratio = recent_median / baseline_median if baseline_median > 0 else float("inf")
+        if ratio >= threshold:
+            regressions.append(
+                {
+                    "class": class_name,
+                    "recent_median": round(recent_median, 6),
+                    "baseline_median": round(baseline_median, 6),
+                    "ratio": round(ratio, 2),
+                    "recent_samples": len(recent),
+                    "baseline_samples": len(baseline),
+                }
+            )
+    return sorted(regressions, key=lambda r: r["ratio"], reverse=True)
+
+
+def recent_runs(path: str, limit: int = 20) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    connection = connect(path)
+    connection.row_factory = sqlite3.Row
+    try:
+        rows = connection.execute(
+            "SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+    finally:
+        connection.close()
+    return [dict(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the execution history")
+    parser.add_argument(
+        "--db", default=os.environ.get("NODER_HISTORY_DB", "../user/history.db")
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    regressions = commands.add_parser("regressions", help="Node classes that got slower")
+    regressions.add_argument("--recent-hours", type=float, default=24)
+    regressions.add_argument("--baseline-days", type=float, default=14)
+    regressions.add_argument("--threshold", type=float, default=1.5)
+    regressions.add_argument("--min-samples", type=int, default=5)
+    runs = commands.add_parser("runs", help="Most recent runs")
+    runs.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "regressions":
+        found = find_regressions(
+            args.db,
+            recent_hours=args.recent_hours,
+            baseline_days=args.baseline_days,
+            threshold=args.threshold,
+            min_samples=args.min_samples,
+        )
+        if not found:
+            print("No regressions")
+        for r in found:
+            print(
+                f"{r['class']:<24} {r['baseline_median'] * 1000:>10.1f}ms -> "
+                f"{r['recent_median'] * 1000:>10.1f}ms  x{r['ratio']:<6} "
+                f"({r['baseline_samples']} / {r['recent_samples']} samples)"
+            )
+        return 1 if found else 0
+    for run in recent_runs(args.db, args.limit):
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started"]))
+        print(
+            f"{started}  {run['kind']:<5} {run['status']:<8} {run['duration'] * 1000:>10.1f}ms"
+            f"  {run['node_count']:>4} nodes  {run['run_id'] or ''}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
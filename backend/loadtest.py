@@ -0,0 +1,349 @@
+"""
+Load test for the /ws endpoint. Simulated clients each hold their own
+websocket and keep sending init_node, run_node and process_flow messages,
+built from saved flows or a synthetic String -> Delay... -> ShowText chain of
+test nodes. Reports throughput, latency percentiles per message type and the
+server process' CPU and memory over time.
+
+    python loadtest.py --spawn --clients 50 --duration 30
+    python loadtest.py --url ws://localhost:3000/ws --server-pid 1234 \\
+        --flow ../user/saved_flows/example.json --mix process_flow=3,run_node=1
+
+A message counts as done when the server answers a scheduler_stats probe sent
+right after it, since each connection's messages are handled in order.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import websockets
+
+import serialization
+
+MESSAGE_TYPES = ("init_node", "run_node", "process_flow")
+
+
+def fetch_catalog(http_url: str) -> Dict[str, Dict]:
+    # POST, since the frontend's catch-all route answers GETs first
+    request = urllib.request.Request(f"{http_url}/python_nodes", data=b"", method="POST")
+    with urllib.request.urlopen(request) as response:
+        nodes = json.load(response)["nodes"]
+    return {entry["name"]: entry for entry in nodes}
+
+
+def make_node(catalog: Dict, label: str, node_id: str, widget_values=None) -> Dict:
+    entry = catalog[label]
+    values = {w["name"]: w.get("value", "") for w in entry["widgets"]}
+    values.update(widget_values or {})
+    return {
+        "id": node_id,
+        "type": "pythonNode",
+        "position": {"x": 0, "y": 0},
+        "data": {
+            "label": label,
+            "inputs": entry["inputs"],
+            "outputs": entry["outputs"],
+            "widgets": entry["widgets"],
+            "widgetValues": values,
+        },
+    }
+
+
+def synthetic_flow(catalog: Dict, depth: int, delay_ms: int, text: str) -> Dict:
+    """String -> Delay x depth -> ShowText"""
+    nodes = [make_node(catalog, "String", "source", {"string": text})]
+    edges = []
+    previous = "source"
+    for i in range(depth):
+        node_id = f"delay_{i}"
+        nodes.append(make_node(catalog, "Delay", node_id, {"delay_ms": delay_ms}))
+        edges.append(edge(catalog, nodes[-2]["data"]["label"], previous, "Delay", node_id))
+        previous = node_id
+    nodes.append(make_node(catalog, "ShowText", "sink"))
+    edges.append(edge(catalog, nodes[-2]["data"]["label"], previous, "ShowText", "sink"))
+    return {"nodes": nodes, "edges": edges}
+
+
+def edge(catalog: Dict, source_label, source, target_label, target) -> Dict:
+    return {
+        "id": f"{source}-{target}",
+        "source": source,
+        "sourceHandle": catalog[source_label]["outputs"][0]["name"],
+        "target": target,
+        "targetHandle": catalog[target_label]["inputs"][0]["name"],
+    }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in MESSAGE_TYPES:
+            raise SystemExit(f"Unknown message type {name}, expected one of {MESSAGE_TYPES}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class ProcessSampler:
+    """Samples CPU and resident memory of a local process from /proc"""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Dict] = []
+        self.ticks = os.sysconf("SC_CLK_TCK")
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            # Fields after the parenthesised command name; utime and stime are 14 and 15
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_kb(self) -> int:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+        return 0
+
+    async def run(self):
+        start = time.monotonic()
+        last_time, last_cpu = start, self.cpu_seconds()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                now, cpu = time.monotonic(), self.cpu_seconds()
+                rss = self.rss_kb()
+            except FileNotFoundError:
+                return
+            self.samples.append(
+                {
+                    "t": round(now - start, 2),
+                    "cpu_percent": round(100 * (cpu - last_cpu) / (now - last_time), 1),
+                    "rss_mb": round(rss / 1024, 1),
+                }
+            )
+            last_time, last_cpu = now, cpu
+
+
+class SimulatedClient:
+    def __init__(self, index: int, args, catalog: Dict, flows: List[Dict], stats):
+        self.index = index
+        self.args = args
+        self.catalog = catalog
+        self.flows = flows
+        self.stats = stats
+        self.weights = parse_mix(args.mix)
+        self.random = random.Random(args.seed + index)
+
+    def build_message(self, message_type: str) -> Dict:
+        flow = self.random.choice(self.flows)
+        if message_type == "process_flow":
+            return {"type": "process_flow", "data": flow}
+        if message_type == "init_node":
+            label = self.random.choice([n["data"]["label"] for n in flow["nodes"]])
+            return {
+                "type": "init_node",
+                "data": make_node(self.catalog, label, f"init_{uuid.uuid4().hex[:8]}"),
+            }
+        # run_node calls a button function, or a source node's run when the flow has none
+        for node in flow["nodes"]:
+            for widget in node["data"].get("widgets", []):
+                if widget.get("type") == "button":
+                    return {
+                        "type": "run_node",
+                        "data": {
+                            **node,
+                            "function_name": widget.get("function_name") or widget.get("value"),
+                        },
+                    }
+        sources = [n for n in flow["nodes"] if not n["data"].get("inputs")] or flow["nodes"]
+        return {"type": "run_node", "data": {**sources[0], "function_name": "run"}}
+
+    async def run(self, deadline: float):
+        try:
+            codec = serialization.negotiate(self.args.encoding)
+            url = self.args.url
+            if codec.binary:
+                url += ("&" if "?" in url else "?") + f"encoding={codec.name}"
+            async with websockets.connect(url, max_size=None) as ws:
+                session = codec.decode(await ws.recv())
+                if session["data"].get("encoding") != codec.name:
+                    codec = serialization.JsonCodec()  # The server fell back
+                while time.monotonic() < deadline:
+                    message_type = self.random.choices(
+                        list(self.weights), weights=list(self.weights.values())
+                    )[0]
+                    await self.send(ws, codec, message_type)
+                    if self.args.think_ms:
+                        await asyncio.sleep(self.random.expovariate(1000 / self.args.think_ms))
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            self.stats["connection_errors"].append(str(e))
+
+    async def send(self, ws, codec, message_type: str):
+        message = self.build_message(message_type)
+        start = time.monotonic()
+        await ws.send(codec.encode(message))
+        await ws.send(codec.encode({"type": "scheduler_stats"}))
+        failed = False
+        while True:
+            reply = codec.decode(await ws.recv())
+            if reply.get("type") == "scheduler_stats":
+                break
+            if reply.get("type") == "error" or reply.get("status") == "error":
+                failed = True
+        latency = time.monotonic() - start
+        self.stats["latency"][message_type].append(latency)
+        self.stats["completed"].append(time.monotonic())
+        if failed:
+            self.stats["errors"][message_type] += 1
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    for _ in range(100):
+        try:
+            fetch_catalog(f"http://127.0.0.1:{port}")
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit("Server did not start")
+
+
+def report(stats, wall: float, sampler: Optional[ProcessSampler]) -> Dict:
+    all_latencies = [l for values in stats["latency"].values() for l in values]
+    summary = {
+        "requests": len(all_latencies),
+        "throughput_per_s": round(len(all_latencies) / wall, 2),
+        "errors": sum(stats["errors"].values()),
+        "connection_errors": len(stats["connection_errors"]),
+        "latency_ms": {},
+    }
+    rows = [("all", all_latencies)] + sorted(stats["latency"].items())
+    print(f"\n{summary['requests']} requests in {wall:.1f}s, {summary['throughput_per_s']}/s")
+    print(f"{'type':<14}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in rows:
+        row = {
+            "count": len(values),
+            "p50": round(percentile(values, 50) * 1000, 1),
+            "p95": round(percentile(values, 95) * 1000, 1),
+            "p99": round(percentile(values, 99) * 1000, 1),
+        }
+        errors = summary["errors"] if name == "all" else stats["errors"][name]
+        summary["latency_ms"][name] = row
+        print(
+            f"{name:<14}{row['count']:>8}{errors:>8}{row['p50']:>10}{row['p95']:>10}{row['p99']:>10}"
+        )
+    if stats["connection_errors"]:
+        print(f"Connection errors: {len(stats['connection_errors'])}, e.g. {stats['connection_errors'][0]}")
+    if sampler and sampler.samples:
+        summary["server"] = sampler.samples
+        print(f"\n{'t s':>6}{'cpu %':>8}{'rss MB':>9}")
+        for sample in sampler.samples:
+            print(f"{sample['t']:>6}{sample['cpu_percent']:>8}{sample['rss_mb']:>9}")
+    return summary
+
+
+async def main(args):
+    http_url = args.url.replace("ws://", "http://").replace("wss://", "https://").rsplit("/ws", 1)[0]
+    catalog = fetch_catalog(http_url)
+    if args.flow:
+        flows = []
+        for path in args.flow:
+            with open(path) as f:
+                flows.append(json.load(f))
+    else:
+        flows = [
+            synthetic_flow(catalog, args.depth, args.delay_ms, f"load test {i}")
+            for i in range(args.clients if args.unique else 1)
+        ]
+
+    stats = {
+        "latency": defaultdict(list),
+        "errors": defaultdict(int),
+        "completed": [],
+        "connection_errors": [],
+    }
+    sampler = ProcessSampler(args.server_pid, args.sample_interval) if args.server_pid else None
+    sampler_task = asyncio.create_task(sampler.run()) if sampler else None
+
+    clients = [
+        SimulatedClient(i, args, catalog, [flows[i % len(flows)]] if args.unique else flows, stats)
+        for i in range(args.clients)
+    ]
+    start = time.monotonic()
+    deadline = start + args.duration
+    tasks = []
+    for client in clients:
+        tasks.append(asyncio.create_task(client.run(deadline)))
+        if args.ramp_up:
+            await asyncio.sleep(args.ramp_up / args.clients)
+    await asyncio.gather(*tasks)
+    wall = time.monotonic() - start
+    if sampler_task:
+        sampler_task.cancel()
+
+    summary = report(stats, wall, sampler)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Websocket load test")
+    parser.add_argument("--url", default="ws://127.0.0.1:3000/ws")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to send for")
+    parser.add_argument("--ramp-up", type=float, default=0, help="Seconds to connect all clients over")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between messages")
+    parser.add_argument("--mix", default="process_flow=3,run_node=1,init_node=1")
+    parser.add_argument("--flow", action="append", help="Saved flow JSON, repeatable")
+    parser.add_argument("--depth", type=int, default=3, help="Delay nodes in the synthetic flow")
+    parser.add_argument("--delay-ms", type=int, default=50)
+    parser.add_argument(
+        "--unique", action="store_true", help="Give each client its own flow, defeating single-flight"
+    )
+    parser.add_argument("--server-pid", type=int, help="Server process to sample CPU/memory of")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--spawn", action="store_true", help="Start a local server on --port")
+    parser.add_argument("--port", type=int, default=3100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--encoding", default="json", choices=["json", "msgpack"], help="Websocket frame encoding"
+    )
+    parser.add_argument("--output", help="Write the summary and server samples as JSON")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        server = spawn_server(args.port)
+        args.url = f"ws://127.0.0.1:{args.port}/ws"
+        args.server_pid = server.pid
+    try:
+        asyncio.run(main(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
@@ -1,15 +1,22 @@
 import ast
+import builtins
 import os
 import inspect
 import importlib.util
 import textwrap
 import json
+import threading
+import time
+import typing
 
 import sys
 import nodes
 
 from typing import Union
-from classes import Node, CaptionedImage, CaptionedVideo
+from classes import Node, LoopNode, CaptionedImage, CaptionedVideo, VideoStream
+
+# Base classes injected into node modules, never offered as nodes themselves
+BASE_CLASSES = {"Node", "LoopNode"}
 
 
 def get_returned_variables(source_code, function_name):
@@ -133,24 +140,86 @@ def get_returned_variables(source_code, function_name):
     return returned_vars, widgets
 
 
+def clean_type_str(type_str):
+    """Helper function to clean type strings"""
+    if type_str.startswith("<class '") and type_str.endswith("'>"):
+        # Extract the class name and remove any module prefix
+        class_name = type_str[8:-2]  # Remove "<class '" and "'>"
+        return f"<class '{class_name.split('.')[-1]}'>"
+    return type_str
+
+
+def describe_run(signature, source_code):
+    """Inputs, outputs and widgets of a run method, from its signature and source"""
+    return_annotation = signature.return_annotation
+    returned_vars, widgets = get_returned_variables(source_code, "run")
+
+    # Handle inputs
+    inputs = []
+    for param_name, param in signature.parameters.items():
+        if param_name != "self":  # Skip self parameter
+            param_type = param.annotation
+            type_str = clean_type_str(str(param_type))
+            accepts_multiple = False
+
+            # Handle Union types
+            if hasattr(param_type, "__origin__"):
+                if param_type.__origin__ is Union:
+                    # Get the base type (either str or custom class)
+                    base_type = param_type.__args__[0]
+                    type_str = clean_type_str(str(base_type))
+
+                    # Check if List[type] is in the Union
+                    list_type = next(
+                        (
+                            t
+                            for t in param_type.__args__
+                            if hasattr(t, "__origin__") and t.__origin__ is list
+                        ),
+                        None,
+                    )
+                    accepts_multiple = bool(list_type)
+
+            input_dict = {
+                "name": param_name,
+                "type": type_str,
+                "accepts_multiple": accepts_multiple,
+                "required": param.default is inspect.Parameter.empty,
+            }
+            inputs.append(input_dict)
+
+    # Handle outputs
+    outputs = []
+    if returned_vars:
+        if getattr(return_annotation, "__origin__", None) is tuple:
+            for var, type_arg in zip(returned_vars, return_annotation.__args__):
+                type_str = clean_type_str(str(type_arg))
+                outputs.append({"name": var, "type": type_str})
+        else:
+            for var in returned_vars:
+                type_str = clean_type_str(str(return_annotation))
+                outputs.append({"name": var, "type": type_str})
+
+    return {
+        "parameters": inputs,
+        "return_type": clean_type_str(str(return_annotation))
+        if return_annotation != inspect.Signature.empty
+        else "None",
+        "returned_variables": returned_vars,
+        "outputs": outputs,
+        "widgets": widgets,
+    }
+
+
 def get_run_methods(module):
     run_methods = {}
 
-    def clean_type_str(type_str):
-        """Helper function to clean type strings"""
-        if type_str.startswith("<class '") and type_str.endswith("'>"):
-            # Extract the class name and remove any module prefix
-            class_name = type_str[8:-2]  # Remove "<class '" and "'>"
-            return f"<class '{class_name.split('.')[-1]}'>"
-        return type_str
-
     for class_name, cls in inspect.getmembers(module, inspect.isclass):
-        if class_name == "Node":
+        if class_name in BASE_CLASSES:
             continue
         for method_name, method in inspect.getmembers(cls, inspect.isfunction):
             if method_name == "run":
                 signature = inspect.signature(method)
-                return_annotation = signature.return_annotation
 
                 try:
                     source_lines, start_line = inspect.getsourcelines(method)
@@ -159,68 +228,10 @@ def get_run_methods(module):
                 except OSError:
                     source_code = ""
 
-                returned_vars, widgets = get_returned_variables(
-                    source_code, method_name
-                )
-
-                # Handle inputs
-                inputs = []
-                for param_name, param in signature.parameters.items():
-                    if param_name != "self":  # Skip self parameter
-                        param_type = param.annotation
-                        type_str = clean_type_str(str(param_type))
-                        accepts_multiple = False
-
-                        # Handle Union types
-                        if hasattr(param_type, "__origin__"):
-                            if param_type.__origin__ is Union:
-                                # Get the base type (either str or custom class)
-                                base_type = param_type.__args__[0]
-                                type_str = clean_type_str(str(base_type))
-
-                                # Check if List[type] is in the Union
-                                list_type = next(
-                                    (
-                                        t
-                                        for t in param_type.__args__
-                                        if hasattr(t, "__origin__")
-                                        and t.__origin__ is list
-                                    ),
-                                    None,
-                                )
-                                accepts_multiple = bool(list_type)
-
-                        input_dict = {
-                            "name": param_name,
-                            "type": type_str,
-                            "accepts_multiple": accepts_multiple,
-                        }
-                        inputs.append(input_dict)
-
-                # Handle outputs
-                outputs = []
-                if returned_vars:
-                    if hasattr(return_annotation, "__args__"):
-                        for var, type_arg in zip(
-                            returned_vars, return_annotation.__args__
-                        ):
-                            type_str = clean_type_str(str(type_arg))
-                            outputs.append({"name": var, "type": type_str})
-                    else:
-                        for var in returned_vars:
-                            type_str = clean_type_str(str(return_annotation))
-                            outputs.append({"name": var, "type": type_str})
-
                 run_methods[f"{class_name}.run"] = {
-                    "parameters": inputs,
-                    "return_type": clean_type_str(str(return_annotation))
-                    if return_annotation != inspect.Signature.empty
-                    else "None",
-                    "returned_variables": returned_vars,
+                    **describe_run(signature, source_code),
                     "file": inspect.getsourcefile(method),
                     "line": start_line,
-                    "outputs": outputs,
-                    "widgets": widgets,
                 }
 
     return run_methods
@@ -230,8 +241,10 @@ def load_script(script_path):
     spec = importlib.util.spec_from_file_location("script", script_path)
     module = importlib.util.module_from_spec(spec)
     module.Node = Node
+    module.LoopNode = LoopNode
     module.CaptionedImage = CaptionedImage
     module.CaptionedVideo = CaptionedVideo
+    module.VideoStream = VideoStream
     spec.loader.exec_module(module)
     return module
 
@@ -252,7 +265,234 @@ def get_node_directories():
     return node_directories
 
 
-def get_python_classes():
+class StaticExtractionError(Exception):
+    """A node module needs to be imported to describe its classes"""
+
+
+# Injected into every node module by load_script
+INJECTED_CLASSES = {
+    "Node": Node,
+    "LoopNode": LoopNode,
+    "CaptionedImage": CaptionedImage,
+    "CaptionedVideo": CaptionedVideo,
+    "VideoStream": VideoStream,
+}
+ANNOTATION_NODES = (
+    ast.Name,
+    ast.Attribute,
+    ast.Subscript,
+    ast.Tuple,
+    ast.List,
+    ast.Constant,
+    ast.BinOp,
+    ast.BitOr,
+    ast.Load,
+)
+
+
+def evaluate_annotation(annotation, namespace):
+    """
+    Builds the object an annotation would evaluate to on import, with local
+    classes stood in for, so its type string matches the imported module's.
+    """
+    if annotation is None:
+        return inspect.Parameter.empty
+    for child in ast.walk(annotation):
+        if not isinstance(child, ANNOTATION_NODES):
+            raise StaticExtractionError(f"Unsupported annotation {ast.unparse(annotation)}")
+    try:
+        return eval(
+            compile(ast.Expression(annotation), "<annotation>", "eval"),
+            {"__builtins__": builtins},
+            namespace,
+        )
+    except Exception as e:
+        raise StaticExtractionError(f"Cannot resolve {ast.unparse(annotation)}: {e}")
+
+
+def static_signature(function, namespace):
+    args = function.args
+    parameters = []
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + args.defaults
+    has_default = object()  # Only whether there is a default matters
+    for arg, default in zip(positional, defaults):
+        kind = (
+            inspect.Parameter.POSITIONAL_ONLY
+            if arg in args.posonlyargs
+            else inspect.Parameter.POSITIONAL_OR_KEYWORD
+        )
+        parameters.append(
+            inspect.Parameter(
+                arg.arg,
+                kind,
+                default=inspect.Parameter.empty if default is None else has_default,
+                annotation=evaluate_annotation(arg.annotation, namespace),
+            )
+        )
+    if args.vararg:
+        parameters.append(
+            inspect.Parameter(
+                args.vararg.arg,
+                inspect.Parameter.VAR_POSITIONAL,
+                annotation=evaluate_annotation(args.vararg.annotation, namespace),
+            )
+        )
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        parameters.append(
+            inspect.Parameter(
+                arg.arg,
+                inspect.Parameter.KEYWORD_ONLY,
+                default=inspect.Parameter.empty if default is None else has_default,
+                annotation=evaluate_annotation(arg.annotation, namespace),
+            )
+        )
+    if args.kwarg:
+        parameters.append(
+            inspect.Parameter(
+                args.kwarg.arg,
+                inspect.Parameter.VAR_KEYWORD,
+                annotation=evaluate_annotation(args.kwarg.annotation, namespace),
+            )
+        )
+    return_annotation = evaluate_annotation(function.returns, namespace)
+    if return_annotation is inspect.Parameter.empty:
+        return_annotation = inspect.Signature.empty
+    return inspect.Signature(parameters, return_annotation=return_annotation)
+
+
+def get_static_classes(script_path, file_name, classification):
+    """
+    Describes a node module's classes from its source alone, in the same
+    format get_run_methods produces, without running any of its code.
+    Raises StaticExtractionError for anything it cannot be sure about.
+    """
+    with open(script_path) as f:
+        source = f.read()
+    tree = ast.parse(source)
+    source_lines = source.splitlines(keepends=True)
+
+    local_classes = {
+        stmt.name: stmt for stmt in tree.body if isinstance(stmt, ast.ClassDef)
+    }
+    # What annotations can refer to: builtins, typing, injected and local classes
+    namespace = dict(INJECTED_CLASSES)
+    for stmt in tree.body:
+        if isinstance(stmt, ast.ImportFrom) and stmt.module == "typing":
+            for alias in stmt.names:
+                namespace[alias.asname or alias.name] = getattr(typing, alias.name)
+        elif isinstance(stmt, ast.Import):
+            for alias in stmt.names:
+                if alias.name == "typing":
+                    namespace[alias.asname or alias.name] = typing
+    for name in local_classes:
+        # Classes of a module loaded by load_script live in module "script"
+        namespace[name] = type(name, (), {"__module__": "script"})
+
+    def find_method(class_def, method_name):
+        """The class' own or inherited method, and whether the class is a Node"""
+        for stmt in class_def.body:
+            if (
+                isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef))
+                and stmt.name == method_name
+            ):
+                return stmt, is_node(class_def)
+        for base in class_def.bases:
+            if not isinstance(base, ast.Name):
+                raise StaticExtractionError(f"Unsupported base of {class_def.name}")
+            if base.id in local_classes:
+                method, node = find_method(local_classes[base.id], method_name)
+                if method:
+                    return method, node
+            elif base.id in BASE_CLASSES:
+                return None, True
+            elif base.id != "object":
+                raise StaticExtractionError(f"Unknown base {base.id} of {class_def.name}")
+        return None, is_node(class_def)
+
+    def is_node(class_def):
+        for base in class_def.bases:
+            if isinstance(base, ast.Name) and base.id in BASE_CLASSES:
+                return True
+            if isinstance(base, ast.Name) and base.id in local_classes:
+                if is_node(local_classes[base.id]):
+                    return True
+        return False
+
+    module_classes = []
+    for class_name in sorted(local_classes):
+        if class_name in BASE_CLASSES:
+            continue
+        class_def = local_classes[class_name]
+        run, node = find_method(class_def, "run")
+        if run is None:
+            if node:
+                # Only Node's own run, which takes *args, **kwargs
+                raise StaticExtractionError(f"{class_name} does not define run")
+            continue
+        run_batch, _ = find_method(class_def, "run_batch")
+
+        first_line = min([run.lineno] + [d.lineno for d in run.decorator_list])
+        source_code = textwrap.dedent("".join(source_lines[first_line - 1 : run.end_lineno]))
+        info = describe_run(static_signature(run, namespace), source_code)
+        module_classes.append(
+            {
+                "name": class_name,
+                "inputs": info["parameters"],
+                "outputs": info["outputs"],
+                "widgets": info["widgets"],
+                "class": None,  # Imported on first use, see load_node_class
+                "supports_batch": node and run_batch is not None,
+                "source_file": file_name,
+                "classification": classification,
+                "script_path": script_path,
+            }
+        )
+    return module_classes
+
+
+# Node modules imported so far, by script path
+loaded_modules = {}
+module_lock = threading.Lock()
+
+
+def load_node_class(python_class):
+    """
+    Returns a catalog entry's class, importing its module the first time any
+    of the module's classes is needed. Blocking, so call it in a thread.
+    """
+    if python_class["class"] is None:
+        script_path = python_class["script_path"]
+        with module_lock:
+            module = loaded_modules.get(script_path)
+            if module is None:
+                start = time.perf_counter()
+                module = load_script(script_path)
+                loaded_modules[script_path] = module
+                print(
+                    f"Imported {python_class['source_file']} in "
+                    f"{time.perf_counter() - start:.3f}s"
+                )
+        python_class["class"] = getattr(module, python_class["name"])
+    return python_class["class"]
+
+
+def preload_node_classes(python_classes, names):
+    """Imports the modules of the named classes up front, or of every class for "*" """
+    for python_class in python_classes:
+        if "*" in names or python_class["name"] in names:
+            try:
+                load_node_class(python_class)
+            except Exception as e:
+                print(f"Error preloading {python_class['name']}: {str(e)}")
+
+
+def get_python_classes(lazy=False):
+    """
+    The node catalog. With lazy, modules are described from their source and
+    only imported when one of their nodes is first used, falling back to an
+    import for modules static extraction cannot handle.
+    """
     python_classes = []
     node_directories = get_node_directories()
 
@@ -270,7 +510,17 @@ def get_python_classes():
                         os.path.splitext(file_name)[0].replace("_", " ").title()
                     )
 
+                    if lazy:
+                        try:
+                            python_classes.extend(
+                                get_static_classes(script_path, file_name, classification)
+                            )
+                            continue
+                        except StaticExtractionError as e:
+                            print(f"Importing {file_name} up front: {str(e)}")
+
                     module = load_script(script_path)
+                    loaded_modules[script_path] = module
                     run_methods = get_run_methods(module)
 
                     inputs = {}
@@ -290,14 +540,17 @@ def get_python_classes():
                             "outputs": outputs.get(cls_name, []),
                             "widgets": widgets.get(cls_name, []),
                             "class": cls_obj,
+                            "supports_batch": issubclass(cls_obj, Node)
+                            and cls_obj.supports_batch(),
                             "source_file": file_name,
                             "classification": classification,  # Add classification field
+                            "script_path": script_path,
                         }
                         for cls_name, cls_obj in inspect.getmembers(
                             module, inspect.isclass
                         )
                         if inspect.isclass(cls_obj)
-                        and cls_name != "Node"
+                        and cls_name not in BASE_CLASSES
                         and hasattr(cls_obj, "run")
                     ]
 
@@ -3,6 +3,8 @@ import asyncio
 
 
 class ShowText(Node):
+    output_node = True
+
     async def run(self, text: str) -> str:
         display_text = self.widgets[0]  # {"type": "textarea", "value": ""}
         await self.update_widget("display_text", text)
@@ -10,50 +12,42 @@ class ShowText(Node):
 
 
 class String(Node):
+    deduplicate = True
+
     async def run(self) -> str:
         string = self.widgets[0]
         return string
 
 
 class SaveImage(Node):
+    output_node = True
+
     async def run(self, input_image: str) -> str:
-        import base64
         import os
         from datetime import datetime
-        from io import BytesIO
-        from PIL import Image
+        from output_writer import get_output_writer
 
-        # Create output directory if it doesn't exist
+        writer = get_output_writer()
         base_output_dir = os.path.join(self.output_dir)  # Base output directory
         output_dir = self.widgets[0]  # Directory path
         filename = self.widgets[1]  # Base filename (optional)
 
         full_output_dir = os.path.join(base_output_dir, output_dir)
 
-        if not os.path.exists(full_output_dir):
-            os.makedirs(full_output_dir)
-
-        # Extract the base64 data from the data URL
-        base64_data = input_image.split(",")[1]
-
-        # Convert base64 to PIL Image
-        image_data = base64.b64decode(base64_data)
-        img = Image.open(BytesIO(image_data))
-
         # Generate filename if not provided
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"image_{timestamp}.png"
-        elif not filename.endswith((".png", ".jpg", ".jpeg")):
-            filename = f"{filename}.png"
+            filename = f"image_{timestamp}.{writer.image_format}"
+        elif not filename.endswith((".png", ".jpg", ".jpeg", ".webp")):
+            filename = f"{filename}.{writer.image_format}"
 
         # Full path for the output file
         output_path = os.path.join(full_output_dir, filename)
 
-        # Save the image
-        img.save(output_path)
+        # Decoding, encoding and the write happen in the background
+        await writer.save_image(output_path, input_image)
 
-        # Return the saved file path
+        # Return the final file path
         return output_path
 
 
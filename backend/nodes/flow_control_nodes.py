@@ -0,0 +1,31 @@
+from typing import Optional
+
+
+class Repeat(LoopNode):
+    async def run(self, initial: str, feedback: Optional[str] = None) -> str:
+        iterations = self.widgets[
+            0
+        ]  # {"type": "slider", "min": 1, "max": 100, "step": 1, "value": 3}
+        self.max_iterations = int(iterations or 1)
+        value = initial if feedback is None else feedback
+        return value
+
+
+class RepeatUntil(LoopNode):
+    async def run(self, initial: str, feedback: Optional[str] = None) -> str:
+        iterations = self.widgets[
+            0
+        ]  # {"type": "slider", "min": 1, "max": 100, "step": 1, "value": 10}
+        stop_text = self.widgets[1]  # { "value": "" }
+        self.max_iterations = int(iterations or 1)
+        self.stop_text = stop_text
+        value = initial if feedback is None else feedback
+        return value
+
+    def continue_loop(self, iteration, previous, current) -> bool:
+        # Stop once the body stops changing the value or produces the stop text
+        if current == previous:
+            return False
+        if self.stop_text and self.stop_text in str(current[0] if current else ""):
+            return False
+        return iteration < self.max_iterations
@@ -3,6 +3,13 @@ import asyncio
 
 
 class GrayscaleImage(Node):
+    output_node = True
+    resources = {"cpu": 1}
+
+    @classmethod
+    def warmup(cls):
+        from PIL import Image
+
     async def run(self, input_image: str) -> str:
         from PIL import Image
         import base64
@@ -3,6 +3,18 @@ import asyncio
 
 
 class OllamaQuery(Node):
+    # The Ollama server may be busy loading a model or briefly unreachable
+    retries = 3
+    retry_backoff = 2.0
+    retry_on = (OSError, TimeoutError)
+    # One generation at a time per slot, see NODER_RESOURCES
+    resources = {"ollama": 1}
+
+    @classmethod
+    def warmup(cls):
+        # Imports the Ollama client before the first query has to
+        import ollama_query
+
     async def run(self) -> Tuple[str, str]:
         from ollama_query import ollama_query
 
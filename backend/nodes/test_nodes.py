@@ -3,6 +3,8 @@ import asyncio
 
 
 class Foo(Node):
+    deduplicate = True
+
     async def run(self) -> Tuple[str, int]:
         first = self.widgets[0]
         second = self.widgets[
@@ -21,6 +23,8 @@ class Foo(Node):
 
 
 class Bar(Node):
+    deduplicate = True
+
     async def run(self, BarInput: str, BarInput2: str) -> Tuple[str, str]:
         BarOutput = BarInput[::-1]
         BarOutput2 = BarInput2[::-1]
@@ -30,6 +34,13 @@ class Bar(Node):
 
 
 class TestImageEdit(Node):
+    output_node = True
+    resources = {"cpu": 1}
+
+    @classmethod
+    def warmup(cls):
+        from PIL import Image, ImageDraw
+
     async def run(self) -> str:
         from PIL import Image, ImageDraw
         import base64
@@ -49,6 +60,8 @@ class TestImageEdit(Node):
 
 
 class MultiInputNode(Node):
+    output_node = True
+
     async def run(self, input_values: Union[str, List[str]]) -> str:
         # Handle both single value and list of values
         if isinstance(input_values, list):
@@ -56,3 +69,33 @@ class MultiInputNode(Node):
             input_values = " ".join(input_values)
         display_text = self.widgets[0]  # {"type": "textarea", "value": ""}
         await self.update_widget("display_text", input_values)
+
+
+class SplitText(Node):
+    deduplicate = True
+
+    async def run(self, text: str) -> List[str]:
+        separator = self.widgets[0]  # { "value": "," }
+        parts = [part.strip() for part in text.split(separator or ",")]
+        return parts
+
+
+class ReverseText(Node):
+    deduplicate = True
+
+    async def run(self, text: str) -> str:
+        reversed_text = text[::-1]
+        return reversed_text
+
+    async def run_batch(self, text: List[str]) -> List[str]:
+        return [item[::-1] for item in text]
+
+
+class Delay(Node):
+    deduplicate = True
+
+    async def run(self, text: str) -> str:
+        delay_ms = self.widgets[0]  # {"type": "slider", "min": 0, "max": 5000, "step": 10, "value": 100}
+        await asyncio.sleep(int(delay_ms) / 1000)  # Simulated I/O bound work
+        delayed_text = text
+        return delayed_text
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import time
+import uuid
+
+
+class OpenVideo(Node):
+    local_only = True  # Decodes to a file on this machine
+
+    async def run(self, captioned_video: CaptionedVideo) -> VideoStream:
+        from video import materialize_video
+
+        width = self.widgets[0]  # {"type": "slider", "min": 0, "max": 3840, "step": 1, "value": 0}
+        height = self.widgets[1]  # {"type": "slider", "min": 0, "max": 2160, "step": 1, "value": 0}
+
+        # Decode an uploaded data URL to a file once, frames are read from disk
+        if getattr(self, "source_video", None) != captioned_video.video:
+            self.release()  # The previous upload's file
+            self.video_path = await asyncio.to_thread(
+                materialize_video,
+                captioned_video.video,
+                os.path.join(self.output_dir, "uploads"),
+            )
+            self.source_video = captioned_video.video
+        video_stream = VideoStream(
+            self.video_path, captioned_video.caption, [], int(width), int(height)
+        )
+        return video_stream
+
+    def release(self):
+        from video import discard_video
+
+        if getattr(self, "source_video", None):
+            discard_video(self.source_video, self.video_path)
+        self.source_video = None
+
+
+class FrameFilter(Node):
+    deduplicate = True
+
+    async def run(self, video_stream: VideoStream) -> VideoStream:
+        operation = self.widgets[0]  # {"type": "dropdown", "options": ["grayscale", "invert", "mirror", "flip", "blur", "edges"]}
+
+        # Frames are filtered lazily when a sink streams the video
+        filtered_stream = VideoStream(
+            video_stream.path,
+            video_stream.caption,
+            video_stream.ops + [operation],
+            video_stream.width,
+            video_stream.height,
+        )
+        return filtered_stream
+
+
+class SaveVideo(Node):
+    output_node = True
+    local_only = True  # Reads and writes video files on this machine
+    resources = {"cpu": 1}
+    memory_estimate = 256 * 1024 * 1024  # Decoded frames buffered between threads
+
+    @classmethod
+    def warmup(cls):
+        import video
+
+    async def run(self, video_stream: VideoStream) -> str:
+        from video import process_video
+
+        preview = self.widgets[0]  # {"type": "image", "value": ""}
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        # Saves within the same second must not replace each other
+        output_path = os.path.join(
+            self.output_dir,
+            f"video_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.y4m",
+        )
+
+        async def show_preview(thumbnail):
+            await self.update_widget("preview", thumbnail)
+
+        frame_count = await process_video(
+            video_stream.path,
+            video_stream.ops,
+            output_path,
+            on_preview=show_preview,
+            width=video_stream.width,
+            height=video_stream.height,
+        )
+        print(f"Wrote {frame_count} frames to {output_path}")
+        return output_path
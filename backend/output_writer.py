@@ -0,0 +1,161 @@
+import asyncio
+import base64
+import os
+import tempfile
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict, List, Optional, Union
+
+FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP"}
+
+
+@dataclass
+class WriteJob:
+    path: str
+    data: Union[str, bytes]  # Image data URL to encode, or bytes written as is
+    future: asyncio.Future
+
+
+def atomic_write(path: str, data: bytes):
+    """Writes to a temporary file next to path and renames it into place, so
+    readers never see a partially written file"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class OutputWriter:
+    """
+    Writes node output files in the background. Nodes enqueue a path and its
+    data and get the path back straight away, a thread encodes and writes up to
+    batch_size queued files at a time, and at most max_queued files wait in
+    memory before enqueuing nodes are held back.
+    """
+
+    def __init__(
+        self,
+        max_queued: int = 64,
+        batch_size: int = 16,
+        image_format: str = "png",
+        compression_level: int = 6,
+        quality: int = 90,
+    ):
+        self.max_queued = max_queued
+        self.batch_size = batch_size
+        self.image_format = image_format.lower().lstrip(".")  # For generated names
+        self.compression_level = compression_level  # PNG zlib level, 0-9
+        self.quality = quality  # JPEG and WebP
+        self.queue: Optional[asyncio.Queue] = None
+        self.task = None
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.queue = asyncio.Queue(self.max_queued)
+            self.task = asyncio.create_task(self.write_loop())
+
+    async def enqueue(self, path: str, data: Union[str, bytes], wait: bool = False) -> str:
+        """Queues a write and returns the final path, or waits for it when wait is set"""
+        self.start()
+        job = WriteJob(path, data, asyncio.get_running_loop().create_future())
+        await self.queue.put(job)
+        if wait:
+            await job.future
+        return path
+
+    async def save_image(self, path: str, data_url: str, wait: bool = False) -> str:
+        return await self.enqueue(path, data_url, wait)
+
+    async def save_bytes(self, path: str, data: bytes, wait: bool = False) -> str:
+        return await self.enqueue(path, data, wait)
+
+    async def write_loop(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            errors = await asyncio.to_thread(self.write_batch, batch)
+            self.batches += 1
+            for job, error in zip(batch, errors):
+                if error is None:
+                    self.written += 1
+                    job.future.set_result(job.path)
+                else:
+                    self.failed += 1
+                    print(f"Error writing {job.path}: {error}")
+                    job.future.set_exception(error)
+                    job.future.exception()  # Mark retrieved, nobody may be waiting
+                self.queue.task_done()
+
+    def write_batch(self, batch: List[WriteJob]) -> List[Optional[Exception]]:
+        errors = []
+        for job in batch:
+            try:
+                data = job.data
+                if isinstance(data, str):
+                    data = self.encode_image(data, os.path.splitext(job.path)[1])
+                atomic_write(job.path, data)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    def encode_image(self, data_url: str, extension: str) -> bytes:
+        from PIL import Image
+
+        img = Image.open(BytesIO(base64.b64decode(data_url.split(",")[-1])))
+        image_format = FORMATS.get(extension.lower(), "PNG")
+        options = {}
+        if image_format == "PNG":
+            options["compress_level"] = self.compression_level
+        else:
+            options["quality"] = self.quality
+            if img.mode not in ("RGB", "L") and image_format == "JPEG":
+                img = img.convert("RGB")
+        buffered = BytesIO()
+        img.save(buffered, format=image_format, **options)
+        return buffered.getvalue()
+
+    async def flush(self):
+        """Waits until everything queued so far is on disk"""
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self.task:
+            self.task.cancel()
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self.queue.qsize() if self.queue else 0,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+_output_writer = None
+
+
+def get_output_writer() -> OutputWriter:
+    """The process wide writer, configured from NODER_OUTPUT_* environment variables"""
+    global _output_writer
+    if _output_writer is None:
+        _output_writer = OutputWriter(
+            max_queued=int(os.environ.get("NODER_OUTPUT_QUEUE", 64)),
+            batch_size=int(os.environ.get("NODER_OUTPUT_BATCH", 16)),
+            image_format=os.environ.get("NODER_OUTPUT_FORMAT", "png"),
+            compression_level=int(os.environ.get("NODER_OUTPUT_COMPRESSION", 6)),
+            quality=int(os.environ.get("NODER_OUTPUT_QUALITY", 90)),
+        )
+    return _output_writer
@@ -1,5 +1,57 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import time
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
+
+from contextlib import asynccontextmanager, nullcontext
+from checkpoint import check_run_id
+from flow_api import flow_key
+from noderizer import load_node_class
+from result_store import ResultStore, estimate_size
+from scheduler import FLOW, INTERACTIVE
+from singleflight import fingerprint
+from worker_pool import WorkerUnavailable
+from validation import FlowValidationError, build_compatibility_table, validate_flow
+
+
+def is_list_type(type_str: str) -> bool:
+    return type_str.startswith(("typing.List[", "list["))
+
+
+# Class warmup hooks run so far, or running, in this process
+class_warmups: Dict[type, asyncio.Task] = {}
+
+
+async def warm_up_class(cls):
+    """Runs a node class' warmup hook in a thread, once per process"""
+    task = class_warmups.get(cls)
+    if task is None or (task.done() and task.exception() is not None):
+        task = class_warmups[cls] = asyncio.create_task(asyncio.to_thread(cls.warmup))
+    await asyncio.shield(task)
+
+
+@dataclass
+class RunState:
+    """Bookkeeping for one execute_nodes call"""
+
+    results: ResultStore
+    wiring: Dict[str, List[Dict]]  # node id -> compiled input connections
+    reads: Counter  # node id -> outgoing edge count
+    mapped_nodes: set = field(default_factory=set)
+    completed: set = field(default_factory=set)
+    run_id: Optional[str] = None  # Set when completed nodes are checkpointed
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    checkpoint_tasks: List = field(default_factory=list)
+    resumed: List[str] = field(default_factory=list)
+    outcomes: Dict[str, Dict] = field(default_factory=dict)  # node id -> outcome
+    failed: set = field(default_factory=set)  # Failed or skipped node ids
+    history: List[Dict] = field(default_factory=list)  # Node executions, for HistoryStore
+    # node id -> widget name -> value output nodes last showed, kept with checkpoints
+    widget_values: Dict[str, Dict] = field(default_factory=dict)
 
 
 class ReactflowNode:
@@ -10,6 +62,8 @@ class ReactflowNode:
         self.data: Dict = node_data.get("data", {})
         self.widget_values: Dict = self.data.get("widgetValues", {})
         self.python_class = None
+        self.cache_hit = False  # Last execution shared another's result
+        self.warming: Optional[asyncio.Task] = None  # See ReactflowGraph.warm_node
 
     @property
     def label(self) -> str:
@@ -29,14 +83,76 @@ class ReactflowNode:
 
 
 class ReactflowGraph:
-    def __init__(self, json_data: Dict, python_classes, websocket=None):
+    def __init__(
+        self,
+        json_data: Dict,
+        python_classes,
+        websocket=None,
+        map_concurrency: int = 4,
+        validation_mode: str = "reject",
+        memory_budget: Optional[int] = None,
+        spill_threshold: int = 1024 * 1024,
+        single_flight=None,
+        scheduler=None,
+        connection_id: Optional[str] = None,
+        worker_pool=None,
+    ):
         self.python_classes = python_classes
         self.nodes: List[ReactflowNode] = []
         self.edges: List[Dict] = []
         self.node_instances = {}  # Store instantiated node classes
         self.websocket = websocket
+        self.map_concurrency = map_concurrency  # Max concurrent runs per mapped node
+        # "reject" refuses invalid flows, "flag" reports problems and drops bad edges
+        self.validation_mode = validation_mode
+        self.validation_problems: List[Dict] = []
+        self.compatibility_table = build_compatibility_table(python_classes)
+        # Bytes of intermediate results kept in memory before spilling to disk
+        self.memory_budget = memory_budget
+        self.spill_threshold = spill_threshold  # Bytes, smaller values spill last
+        self.last_run_stats: Dict = {}
+        self.last_results: Dict = {}
+        self.single_flight = single_flight  # Shared SingleFlight deduplicating runs
+        self.scheduler = scheduler  # Shared Scheduler every node execution waits on
+        self.connection_id = connection_id
+        self.worker_pool = worker_pool  # Remote workers serving some node classes
+        # Large values from local workers stay in shared memory between nodes
+        self.shared_memory = worker_pool.transport if worker_pool else None
+        self.max_loop_iterations = 1000  # Hard cap for LoopNode bodies
+        self.progress_interval = 0.25  # Min seconds between iteration messages
+        # Only run nodes that feed an output node (or requested targets)
+        self.lazy_evaluation = False
+        self.usage = None  # ConnectionUsage charged for this graph's node runs
+        self.checkpoints = None  # CheckpointStore for runs given a run_id
+        # "isolate" skips only the descendants of a failed node, "abort" stops the run
+        self.failure_policy = "isolate"
+        self.last_outcomes: Dict[str, Dict] = {}
+        self.history = None  # HistoryStore recording every run
+        self.resources = None  # ResourcePools node runs take their declared slots from
         # self.update_from_json(json_data)
 
+    def attach_websocket(self, websocket):
+        """Rebinds the graph and every node instance to a (re)connected client"""
+        self.websocket = websocket
+        for node in self.nodes:
+            if hasattr(node.python_class, "instantiated"):
+                node.python_class.websocket = websocket
+
+    async def notify(self, message: Dict):
+        """Sends a message to the client, if there is one (REST runs have none)"""
+        if self.websocket:
+            await self.websocket.send_json(message)
+
+    def estimated_size(self) -> int:
+        """Rough bytes held by node instances and the last run's results"""
+        size = estimate_size(self.last_results)
+        for node in self.nodes:
+            if hasattr(node.python_class, "instantiated"):
+                size += estimate_size(
+                    {k: v for k, v in vars(node.python_class).items() if k != "websocket"}
+                )
+        return size
+
     async def update_node(self, node_data):
         node_id = node_data["id"]
 
@@ -55,36 +171,99 @@ class ReactflowGraph:
         else:
             # Create new node
             new_node = ReactflowNode(node_data)
-            # Find and assign python class
-            for python_class in self.python_classes:
-                if new_node.data["label"] == python_class["name"]:
-                    new_node.python_class = python_class["class"]
-                    if not hasattr(new_node.python_class, "instantiated"):
-                        await self.websocket.send_json(
-                            {
-                                "type": "success",
-                                "data": f"{node_data['data']['label']} initializing",
-                            }
-                        )
-                        # Create new instance only for new nodes
-                        new_node.python_class = new_node.python_class()
-                        await self.websocket.send_json(
-                            {
-                                "type": "success",
-                                "data": f"{node_data['data']['label']} initialized",
-                            }
-                        )
-
-                        new_node.python_class.websocket = self.websocket
-                        new_node.python_class.node_id = node_id
+            python_class = self.catalog_entry(new_node)
+            if python_class:
+                new_node.python_class = python_class["class"]  # None until imported
+                # Imported, instantiated and warmed up in the background; runs wait for it
+                new_node.warming = asyncio.create_task(self.warm_node(new_node))
             return new_node
 
+    def release_node(self, node: ReactflowNode):
+        if hasattr(node.python_class, "instantiated"):
+            try:
+                node.python_class.release()
+            except Exception as e:
+                print(f"Error releasing {node.label}: {str(e)}")
+
+    def close(self):
+        """Releases every node instance, the graph is not used again"""
+        for node in self.nodes:
+            self.release_node(node)
+        self.nodes = []
+
+    def catalog_entry(self, node: ReactflowNode) -> Optional[Dict]:
+        return next(
+            (entry for entry in self.python_classes if entry["name"] == node.label), None
+        )
+
+    async def warm_node(self, node: ReactflowNode, raise_errors: bool = False):
+        """
+        Imports the node's class if needed, instantiates it off the event loop
+        and runs the class' warmup hook once, reporting progress as the node's
+        status. Failures are reported and left for the first run to retry,
+        or raised with raise_errors.
+        """
+        python_class = self.catalog_entry(node)
+        label = node.label
+        try:
+            await self.notify({"type": "success", "data": f"{label} initializing"})
+            await self.node_status(node.id, "warming")
+            if python_class["class"] is None:
+                # Node modules are imported on first use, off the event loop
+                await asyncio.to_thread(load_node_class, python_class)
+            cls = python_class["class"]
+            if not hasattr(node.python_class, "instantiated"):
+                instance = await asyncio.to_thread(cls)
+                instance.websocket = self.websocket
+                instance.node_id = node.id
+                node.python_class = instance
+            await self.notify({"type": "success", "data": f"{label} initialized"})
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error initializing {label}: {str(e)}")
+            await self.notify({"type": "error", "data": f"{label} failed to initialize: {e}"})
+            await self.node_status(node.id, "run_failed")
+            return
+        try:
+            await warm_up_class(cls)
+        except Exception as e:
+            # Only an optimization, the node's runs will report anything that matters
+            print(f"Error warming up {label}: {str(e)}")
+        await self.node_status(node.id, "ready")
+
+    async def warmed(self, nodes: List[ReactflowNode]):
+        """Waits for nodes still warming up, and retries ones that failed to"""
+        for node in nodes:
+            if node.warming is not None:
+                await node.warming
+                node.warming = None
+            if not hasattr(node.python_class, "instantiated") and self.catalog_entry(node):
+                await self.warm_node(node, raise_errors=True)
+
+    async def node_status(self, node_id: str, status: str):
+        await self.notify(
+            {
+                "type": "node_message",
+                "data": {"nodeId": node_id, "message": {"type": "status", "data": status}},
+            }
+        )
+
     async def initialize_node(self, node_data):
         node = await self.update_node(node_data)
         self.nodes.append(node)
 
-    async def update_from_json(self, json_data: Dict):
-        """Updates the graph with new JSON data while preserving existing node instances"""
+    async def update_from_json(
+        self,
+        json_data: Dict,
+        targets: Optional[List[str]] = None,
+        lazy: Optional[bool] = None,
+    ):
+        """
+        Updates the graph with new JSON data while preserving existing node
+        instances. targets and lazy are those of the run to follow, so nodes
+        it will prune are not held to their required inputs.
+        """
         new_nodes = json_data.get("nodes", [])
         self.edges = json_data.get("edges", [])
 
@@ -95,7 +274,35 @@ class ReactflowGraph:
             updated_nodes.append(updated_node)
 
         # Remove nodes that no longer exist in the new data
+        for node in self.nodes:
+            if node not in updated_nodes:
+                self.release_node(node)
         self.nodes = updated_nodes
+        await self.validate(targets, lazy)
+
+    async def validate(
+        self, targets: Optional[List[str]] = None, lazy: Optional[bool] = None
+    ):
+        """
+        Checks edges and required inputs against the catalog before anything runs,
+        so a bad connection is reported up front instead of mid-run.
+        """
+        problems = validate_flow(
+            self.nodes,
+            self.edges,
+            self.python_classes,
+            self.compatibility_table,
+            self.run_targets(targets, lazy),
+        )
+        self.validation_problems = problems
+        if not problems:
+            return
+        if self.validation_mode == "reject":
+            raise FlowValidationError(problems)
+
+        bad_edges = {p["edge_index"] for p in problems if p["edge_index"] is not None}
+        self.edges = [edge for i, edge in enumerate(self.edges) if i not in bad_edges]
+        await self.notify({"type": "error", "data": str(FlowValidationError(problems))})
 
     def get_node_by_id(self, node_id: str) -> Optional[ReactflowNode]:
         return next((node for node in self.nodes if node.id == node_id), None)
@@ -197,6 +404,46 @@ class ReactflowGraph:
 
         return {"inputs": input_connections, "outputs": output_connections}
 
+    def is_feedback_edge(self, edge: Dict) -> bool:
+        target = self.get_node_by_id(edge["target"])
+        return target is not None and edge.get("targetHandle") in getattr(
+            target.python_class, "feedback_inputs", ()
+        )
+
+    def compile_wiring(self) -> Dict[str, List[Dict]]:
+        """Resolves every node's input connections once per run"""
+        return {node.id: self.get_connected_nodes(node.id)["inputs"] for node in self.nodes}
+
+    def loop_body(self, loop_node: ReactflowNode, ordered_nodes) -> List[ReactflowNode]:
+        """
+        Nodes downstream of a loop node that also lead back into one of its
+        feedback inputs, in execution order.
+        """
+        forward, backward = defaultdict(list), defaultdict(list)
+        feedback_sources = []
+        for edge in self.edges:
+            if self.is_feedback_edge(edge):
+                if edge["target"] == loop_node.id:
+                    feedback_sources.append(edge["source"])
+                continue
+            forward[edge["source"]].append(edge["target"])
+            backward[edge["target"]].append(edge["source"])
+
+        def reachable(start, adjacency):
+            seen, stack = set(start), list(start)
+            while stack:
+                for next_id in adjacency[stack.pop()]:
+                    if next_id not in seen:
+                        seen.add(next_id)
+                        stack.append(next_id)
+            return seen
+
+        body_ids = reachable([loop_node.id], forward) & reachable(
+            feedback_sources, backward
+        )
+        body_ids.discard(loop_node.id)
+        return [node for node in ordered_nodes if node.id in body_ids]
+
     def get_execution_order(self) -> List[ReactflowNode]:
         """
         Determines node execution order using topological sort.
@@ -206,8 +453,10 @@ class ReactflowGraph:
         adj_list = defaultdict(list)
         in_degree = defaultdict(int)
 
-        # Build the graph representation
+        # Build the graph representation, loop feedback edges are not dependencies
         for edge in self.edges:
+            if self.is_feedback_edge(edge):
+                continue
             source_id = edge["source"]
             target_id = edge["target"]
             adj_list[source_id].append(target_id)
@@ -237,86 +486,718 @@ class ReactflowGraph:
         if len(execution_order) != len(self.nodes):
             raise ValueError("Graph contains cycles")
 
-        return execution_order
+        return self.group_loops(execution_order)
+
+    def group_loops(self, execution_order: List[ReactflowNode]) -> List[ReactflowNode]:
+        """
+        Reorders a topological order so each loop node is directly followed by
+        its body, and the whole group comes after every node outside it that
+        the loop or its body reads from. A nested loop runs in its outer one.
+        """
+        unit = {}  # Node id -> id of the loop node whose group it runs in
+        for node in execution_order:
+            if getattr(node.python_class, "feedback_inputs", None):
+                for member in [node] + self.loop_body(node, execution_order):
+                    unit.setdefault(member.id, node.id)
+        if not unit:
+            return execution_order
+
+        adj_list = defaultdict(list)
+        in_degree = defaultdict(int)
+        for edge in self.edges:
+            if self.is_feedback_edge(edge):
+                continue
+            source_unit = unit.get(edge["source"], edge["source"])
+            target_unit = unit.get(edge["target"], edge["target"])
+            if source_unit != target_unit:
+                adj_list[source_unit].append(target_unit)
+                in_degree[target_unit] += 1
+
+        members = defaultdict(list)
+        for node in execution_order:
+            members[unit.get(node.id, node.id)].append(node)
+        queue = deque(unit_id for unit_id in members if in_degree[unit_id] == 0)
+        grouped_order = []
+        while queue:
+            unit_id = queue.popleft()
+            grouped_order.extend(members[unit_id])
+            for target_unit in adj_list[unit_id]:
+                in_degree[target_unit] -= 1
+                if in_degree[target_unit] == 0:
+                    queue.append(target_unit)
+
+        if len(grouped_order) != len(execution_order):
+            stuck = sorted(
+                {self.get_node_by_id(unit_id).label for unit_id in members if in_degree[unit_id]}
+            )
+            raise ValueError(f"Loops {', '.join(stuck)} wait on each other's bodies")
+        return grouped_order
 
     async def execute_node(self, node_data):
         node = self.get_node_by_id(node_data["id"])
         if not node:
             print("Error: Did not find node. Returning nothing")
             return
-        if not hasattr(node.python_class, "instantiated"):
-            node.python_class = node.python_class()
-            node.python_class.websocket = self.websocket
+        await self.warmed([node])
+
+        input_args = {}
+        if node_data.get("pull_inputs"):
+            input_args = await self.pull_inputs(node)
 
         node.python_class.node_id = node.id
         node.python_class.widgets = list(node.widget_values.values())
+        started, start = time.time(), time.perf_counter()
+        function_name = node_data.get("function_name")
         try:
-            function_name = node_data.get("function_name")
             if function_name and hasattr(node.python_class, function_name):
                 func = getattr(node.python_class, function_name)
-                await func()
+                parameters = inspect.signature(func).parameters
+                if not any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+                    input_args = {k: v for k, v in input_args.items() if k in parameters}
+
+                async def call():
+                    async with self.scheduled(INTERACTIVE):
+                        await func(**input_args)
+
+                await self.metered(call())
             else:
                 print("That function didn't exist")
         except Exception as e:
             print(f"Error executing node {node.label}: {str(e)}")
+            self.record_node_run(node, function_name, started, start, input_args, str(e))
             raise
-        await self.websocket.send_json(
+        self.record_node_run(node, function_name, started, start, input_args)
+        await self.notify(
             {"type": "success", "data": f"{node_data['data']['label']} executed"}
         )
 
-    async def execute_nodes(self):
+    def history_entry(
+        self,
+        node: ReactflowNode,
+        started: float,
+        start: float,
+        input_args: Dict,
+        result=None,
+        error: Optional[str] = None,
+    ) -> Dict:
+        return {
+            "node_id": node.id,
+            "class": node.label,
+            "started": started,
+            "duration": time.perf_counter() - start,
+            "input_bytes": estimate_size(input_args),
+            "output_bytes": estimate_size(result) if error is None else None,
+            "cache_hit": node.cache_hit,
+            "status": "failed" if error else "success",
+            "error": error,
+        }
+
+    def record_node_run(
+        self,
+        node: ReactflowNode,
+        function_name: Optional[str],
+        started: float,
+        start: float,
+        input_args: Dict,
+        error: Optional[str] = None,
+    ):
+        """Records a button press (execute_node) as a run of one node"""
+        if not self.history:
+            return
+        node.cache_hit = False
+        entry = self.history_entry(node, started, start, input_args, error=error)
+        entry.update(function=function_name, output_bytes=None)
+        self.history.record(
+            "node",
+            [entry],
+            started,
+            entry["duration"],
+            entry["status"],
+            session_id=self.connection_id,
+            flow=self.flow_fingerprint(),
+        )
+
+    def flow_fingerprint(self) -> str:
+        """The current flow's flow_key, so history groups runs of the same flow"""
+        return flow_key(
+            {
+                "nodes": [{"id": node.id, "data": node.data} for node in self.nodes],
+                "edges": self.edges,
+            }
+        )
+
+    def local_values(self, value):
+        """Copies shared memory handles back into values for a node running here"""
+        return self.shared_memory.resolve(value) if self.shared_memory else value
+
+    def metered(self, coroutine):
+        """Charges a node execution to the session's usage and quotas, if any"""
+        return self.usage.run(coroutine) if self.usage else coroutine
+
+    async def pull_inputs(self, node: ReactflowNode) -> Dict:
         """
-        Executes all nodes in order, passing outputs to connected inputs.
+        Runs exactly the nodes upstream of one node and returns the values
+        arriving at its inputs, keyed by input name.
         """
-        node_results = {}
-        ordered_nodes = self.get_execution_order()
+        connections = self.get_connected_nodes(node.id)["inputs"]
+        sources = list({conn["node"].id for conn in connections})
+        if not sources:
+            return {}
+        results = await self.execute_nodes(retain=sources, targets=sources)
 
-        for node in ordered_nodes:
-            if not hasattr(node.python_class, "instantiated"):
-                node.python_class = node.python_class()
-                node.python_class.websocket = self.websocket
-
-            node.python_class.node_id = node.id
-            node.python_class.widgets = list(node.widget_values.values())
-
-            connections = self.get_connected_nodes(node.id)
-            input_args = {}
-
-            # Group inputs by target handle
-            grouped_inputs = {}
-            for conn in connections["inputs"]:
-                target_handle = conn["target_handle"]
-                if target_handle not in grouped_inputs:
-                    grouped_inputs[target_handle] = []
-
-                source_results = node_results[conn["node"].id]
-                if conn["source_index"] < len(source_results):
-                    grouped_inputs[target_handle].append(
-                        source_results[conn["source_index"]]
+        grouped_inputs = defaultdict(list)
+        for conn in connections:
+            source_results = results.get(conn["node"].id, [])
+            if 0 <= conn["source_index"] < len(source_results):
+                grouped_inputs[conn["target_handle"]].append(
+                    source_results[conn["source_index"]]
+                )
+        return {
+            handle: values[0] if len(values) == 1 else values
+            for handle, values in grouped_inputs.items()
+        }
+
+    def is_mapped_connection(self, conn: Dict, node: ReactflowNode, mapped_nodes) -> bool:
+        """
+        A connection is mapped when a list (a List-typed output, or the output of a
+        node that was itself mapped) feeds a scalar input. The consumer then runs
+        once per element instead of receiving the whole list.
+        """
+        target_input = next(
+            (inp for inp in node.inputs if inp.get("name") == conn["target_handle"]),
+            {},
+        )
+        if target_input.get("accepts_multiple") or is_list_type(
+            target_input.get("type", "")
+        ):
+            return False
+        if conn["node"].id in mapped_nodes:
+            return True
+        source_outputs = conn["node"].outputs
+        if 0 <= conn["source_index"] < len(source_outputs):
+            return is_list_type(source_outputs[conn["source_index"]].get("type", ""))
+        return False
+
+    def scheduled(self, priority: int = FLOW):
+        if self.scheduler is None:
+            return nullcontext()
+        return self.scheduler.slot(self.connection_id, priority)
+
+    def reserved(self, node: ReactflowNode):
+        """
+        Holds the resource slots the node's class declares while it runs. Taken
+        before the scheduler slot, so nodes waiting on a resource block no others.
+        """
+        if self.resources is None:
+            return nullcontext()
+        instance = node.python_class
+
+        async def waiting():
+            await instance.set_status("waiting_for_resource")
+
+        return self.resources.acquire(
+            instance.resources, instance.memory_estimate, waiting
+        )
+
+    @asynccontextmanager
+    async def slots(self, node: ReactflowNode):
+        """Resource slots, then a scheduler slot, held for one attempt at a node"""
+        async with self.reserved(node), self.scheduled(FLOW):
+            yield
+
+    async def run_node_instance(
+        self, node: ReactflowNode, input_args: Dict, batch: bool = False
+    ):
+        """
+        Runs the node through quota metering, single-flight, resource and
+        scheduler slots and worker routing. With batch, input_args hold lists
+        for run_batch and the result is one output list per element.
+        """
+        instance = node.python_class
+        function = "run_batch" if batch else "run"
+
+        async def call():
+            if (
+                self.worker_pool
+                and not instance.local_only
+                and self.worker_pool.serves(type(instance).__name__)
+            ):
+                try:
+                    async with self.slots(node):
+                        # The worker retries failures itself
+                        return await self.worker_pool.run(
+                            instance, input_args, self.connection_id, function
+                        )
+                except WorkerUnavailable as e:
+                    print(f"{e}, running {node.label} locally")
+            # Slots are taken for each attempt and given back during a retry's backoff
+            return await instance._call(
+                function, (), self.local_values(input_args), lambda: self.slots(node)
+            )
+
+        async def execute():
+            if self.single_flight and instance.deduplicate:
+                key = fingerprint(
+                    f"{type(instance).__name__}.{function}", instance.widgets, input_args
+                )
+                if key in self.single_flight.flights:
+                    node.cache_hit = True  # Joins an identical run in progress
+                return await self.single_flight.run(key, instance, call)
+            return await call()
+
+        result = await self.metered(execute())
+        return list(result) if isinstance(result, (list, tuple)) else [result]
+
+    async def run_mapped(self, node: ReactflowNode, input_args: Dict, mapped_handles):
+        """
+        Runs a node once per element of its mapped inputs. Unmapped inputs are
+        broadcast to every element. Nodes implementing run_batch get the whole
+        batch in one call, others run concurrently up to map_concurrency.
+        Returns one list per output slot holding the per-element values.
+        """
+        lengths = {len(input_args[handle]) for handle in mapped_handles}
+        if len(lengths) > 1:
+            raise ValueError(
+                f"Node {node.label} map error: mapped inputs have different lengths {sorted(lengths)}"
+            )
+        count = lengths.pop()
+        element_args = [
+            {
+                handle: value[i] if handle in mapped_handles else value
+                for handle, value in input_args.items()
+            }
+            for i in range(count)
+        ]
+
+        if node.python_class.supports_batch():
+            batch_args = {
+                handle: [args[handle] for args in element_args] for handle in input_args
+            }
+            element_results = await self.run_node_instance(node, batch_args, batch=True)
+        else:
+            semaphore = asyncio.Semaphore(self.map_concurrency)
+
+            async def run_element(args):
+                async with semaphore:
+                    return await self.run_node_instance(node, args)
+
+            element_results = await asyncio.gather(
+                *(run_element(args) for args in element_args)
+            )
+
+        output_count = max(
+            [len(node.outputs)] + [len(result) for result in element_results]
+        )
+        return [
+            [result[i] if i < len(result) else None for result in element_results]
+            for i in range(output_count)
+        ]
+
+    def prepare_instance(self, node: ReactflowNode):
+        if not hasattr(node.python_class, "instantiated"):
+            node.python_class = node.python_class()
+            node.python_class.websocket = self.websocket
+
+        node.python_class.node_id = node.id
+        node.python_class.widgets = list(node.widget_values.values())
+
+    async def execute_one(
+        self, node: ReactflowNode, run: RunState, include_feedback: bool = True
+    ):
+        """Runs one node on the current results of its inputs and stores its outputs"""
+        self.prepare_instance(node)
+        feedback_inputs = getattr(node.python_class, "feedback_inputs", ())
+        connections = [
+            conn
+            for conn in run.wiring[node.id]
+            if include_feedback or conn["target_handle"] not in feedback_inputs
+        ]
+        input_args = {}
+
+        # Group inputs by target handle
+        grouped_inputs = {}
+        mapped_handles = set()
+        for conn in connections:
+            target_handle = conn["target_handle"]
+            if target_handle not in grouped_inputs:
+                grouped_inputs[target_handle] = []
+
+            source_results = await run.results.get(conn["node"].id)
+            if conn["source_index"] < len(source_results):
+                value = source_results[conn["source_index"]]
+                grouped_inputs[target_handle].append(value)
+                if isinstance(value, list) and self.is_mapped_connection(
+                    conn, node, run.mapped_nodes
+                ):
+                    mapped_handles.add(target_handle)
+            else:
+                raise ValueError(
+                    f"Node {node.label} connection error:\n"
+                    f"- Trying to connect to output index {conn['source_index']} from {conn['node'].label}\n"
+                    f"- But {conn['node'].label} only has {len(source_results)} outputs\n"
+                    f"- Available outputs: {source_results}"
+                )
+
+        # Convert grouped inputs to final input arguments
+        for handle, values in grouped_inputs.items():
+            if len(values) == 1:
+                input_args[handle] = values[0]
+            else:
+                # Several connections into one handle are gathered, not mapped
+                mapped_handles.discard(handle)
+                input_args[handle] = values
+
+        node.cache_hit = False
+        started, start = time.time(), time.perf_counter()
+        instance = node.python_class
+        shown = None
+        if run.run_id and instance.output_node:
+            shown = run.widget_values.setdefault(node.id, {})
+
+            async def shown_widget(message_type, data):
+                if message_type == "widget_update":
+                    shown[data["name"]] = data["value"]
+
+            instance.message_listeners.append(shown_widget)
+        try:
+            if mapped_handles:
+                result = await self.run_mapped(node, input_args, mapped_handles)
+                run.mapped_nodes.add(node.id)
+            else:
+                result = await self.run_node_instance(node, input_args)
+            await run.results.put(node.id, result, run.reads[node.id])
+
+        except Exception as e:
+            print(f"Error executing node {node.label}: {str(e)}")
+            if self.history:
+                run.history.append(
+                    self.history_entry(node, started, start, input_args, error=str(e))
+                )
+            raise
+        finally:
+            if shown is not None:
+                instance.message_listeners.remove(shown_widget)
+        if self.history:
+            run.history.append(self.history_entry(node, started, start, input_args, result))
+
+        for conn in connections:
+            run.results.consume(conn["node"].id)
+
+    async def execute_loop(self, loop_node: ReactflowNode, ordered_nodes, run: RunState):
+        """
+        Runs a LoopNode and its body entirely in the backend, reusing the same
+        node instances and compiled wiring on every pass.
+        """
+        group = [loop_node] + self.loop_body(loop_node, ordered_nodes)
+        body = group[1:]
+        # Every pass re-reads these results, so keep them until the loop ends
+        pinned = {node.id for node in group} | {
+            conn["node"].id for node in group for conn in run.wiring[node.id]
+        }
+        pinned -= run.results.pinned  # Retained for the caller, not for the loop
+        run.results.pinned |= pinned
+        try:
+            await self.execute_one(loop_node, run, include_feedback=False)
+            instance = loop_node.python_class
+            max_iterations = min(
+                int(getattr(instance, "max_iterations", 1)), self.max_loop_iterations
+            )
+            last_progress = 0.0
+
+            for iteration in range(1, self.max_loop_iterations + 1):
+                previous = await run.results.get(loop_node.id)
+                for node in body:
+                    await self.execute_one(node, run)
+                await self.execute_one(loop_node, run)
+                current = await run.results.get(loop_node.id)
+
+                keep_going = iteration < self.max_loop_iterations and instance.continue_loop(
+                    iteration, previous, current
+                )
+                now = time.monotonic()
+                if not keep_going or now - last_progress >= self.progress_interval:
+                    last_progress = now
+                    await instance.send_message(
+                        "iteration",
+                        {"iteration": iteration, "max_iterations": max_iterations},
                     )
-                else:
-                    raise ValueError(
-                        f"Node {node.label} connection error:\n"
-                        f"- Trying to connect to output index {conn['source_index']} from {conn['node'].label}\n"
-                        f"- But {conn['node'].label} only has {len(source_results)} outputs\n"
-                        f"- Available outputs: {source_results}"
+                if not keep_going:
+                    break
+        finally:
+            run.results.pinned -= pinned
+
+        run.completed.update(node.id for node in body)
+
+    def node_fingerprints(self) -> Dict[str, str]:
+        """
+        Identifies each node by its class, widget values and the fingerprints
+        of everything upstream, so a changed node invalidates its descendants.
+        """
+        fingerprints = {}
+        for node in self.get_execution_order():
+            upstream = sorted(
+                (
+                    edge.get("targetHandle") or "",
+                    edge.get("sourceHandle") or "",
+                    # Feedback sources run later, name them rather than recurse
+                    edge["source"]
+                    if self.is_feedback_edge(edge)
+                    else fingerprints.get(edge["source"], ""),
+                )
+                for edge in self.edges
+                if edge["target"] == node.id
+            )
+            payload = json.dumps(
+                [node.label, node.widget_values, upstream], sort_keys=True, default=str
+            )
+            fingerprints[node.id] = hashlib.sha256(payload.encode()).hexdigest()
+        return fingerprints
+
+    async def resume_nodes(self, group: List[ReactflowNode], run: RunState, saved: set) -> bool:
+        """
+        Loads the checkpointed outputs of a node, or of a loop node and its
+        whole body, in place of running them. Returns False if any is missing.
+        """
+        if any(run.fingerprints[node.id] not in saved for node in group):
+            return False
+        checkpoints = []
+        for node in group:
+            checkpoint = await self.checkpoints.load(run.run_id, run.fingerprints[node.id])
+            if checkpoint is None:
+                return False
+            checkpoints.append(checkpoint)
+        for node, checkpoint in zip(group, checkpoints):
+            loaded = checkpoint["values"]
+            await run.results.put(node.id, loaded, run.reads[node.id])
+            # Output nodes show what they showed when the checkpoint was taken
+            for name, value in checkpoint["widgets"].items():
+                await node.python_class.update_widget(name, value)
+            run.completed.add(node.id)
+            run.resumed.append(node.id)
+            run.outcomes[node.id] = {"status": "resumed"}
+            if self.history:
+                run.history.append(
+                    {
+                        "node_id": node.id,
+                        "class": node.label,
+                        "started": time.time(),
+                        "duration": 0.0,
+                        "output_bytes": estimate_size(loaded),
+                        "cache_hit": True,
+                        "status": "resumed",
+                    }
+                )
+        self.consume_inputs(group, run)
+        return True
+
+    def consume_inputs(self, group: List[ReactflowNode], run: RunState):
+        """
+        Counts one read of every connection into a group that ran as a whole,
+        a loop and its body, releasing what nothing else will read. Reads made
+        while the loop pinned its inputs were not counted.
+        """
+        for node in group:
+            for conn in run.wiring[node.id]:
+                run.results.consume(conn["node"].id)
+
+    async def checkpoint_nodes(self, group: List[ReactflowNode], run: RunState):
+        """Saves the outputs of freshly completed nodes in the background"""
+        if not run.run_id:
+            return
+        for node in group:
+            if node.id in run.results:
+                values = await run.results.get_local(node.id)
+                run.checkpoint_tasks.append(
+                    asyncio.create_task(
+                        self.checkpoints.save(
+                            run.run_id,
+                            run.fingerprints[node.id],
+                            values,
+                            run.widget_values.get(node.id),
+                        )
                     )
+                )
 
-            # Convert grouped inputs to final input arguments
-            for handle, values in grouped_inputs.items():
-                if len(values) == 1:
-                    input_args[handle] = values[0]
-                else:
-                    input_args[handle] = values
+    def run_targets(
+        self, targets: Optional[List[str]] = None, lazy: Optional[bool] = None
+    ) -> Optional[set]:
+        """Ids of the nodes a run with these targets executes, None if all of them"""
+        lazy = self.lazy_evaluation if lazy is None else lazy
+        if targets is None and lazy:
+            targets = self.output_node_ids()
+        if targets is None:
+            return None
+        # A target may name one output ("node_id.output"), the node runs either way
+        return self.required_nodes([t.partition(".")[0] for t in targets])
 
-            try:
-                result = await node.python_class._run(**input_args)
-                node_results[node.id] = (
-                    list(result) if isinstance(result, (list, tuple)) else [result]
+    def required_nodes(self, targets: List[str]) -> set:
+        """Ids of the targets and everything upstream of them, loop feedback included"""
+        backward = defaultdict(list)
+        for edge in self.edges:
+            backward[edge["target"]].append(edge["source"])
+        required, stack = set(targets), list(targets)
+        while stack:
+            for source_id in backward[stack.pop()]:
+                if source_id not in required:
+                    required.add(source_id)
+                    stack.append(source_id)
+        return required
+
+    def output_node_ids(self) -> List[str]:
+        return [
+            node.id
+            for node in self.nodes
+            if getattr(node.python_class, "output_node", False)
+        ]
+
+    async def execute_nodes(
+        self,
+        retain: Optional[List[str]] = None,
+        targets: Optional[List[str]] = None,
+        lazy: Optional[bool] = None,
+        run_id: Optional[str] = None,
+        resume: bool = False,
+    ):
+        """
+        Executes all nodes in order, passing outputs to connected inputs.
+        Intermediate results are released once their last consumer has run;
+        the results of nodes nobody consumes, and of any node ids in retain,
+        are returned.
+
+        With targets, or in lazy mode (output nodes as targets), only the
+        targets and their upstream nodes run; the pruned ids are reported.
+
+        With a run_id and a checkpoint store, each completed node's outputs
+        are saved; resume loads the saved outputs of nodes whose fingerprint
+        is unchanged instead of running them again.
+        """
+        if run_id and self.checkpoints:
+            check_run_id(run_id)  # Names a directory of the checkpoint store
+        started, start = time.time(), time.perf_counter()
+        await self.warmed(self.nodes)
+        ordered_nodes = self.get_execution_order()
+        required = self.run_targets(targets, lazy)
+        if required is not None:
+            pruned = [node.id for node in ordered_nodes if node.id not in required]
+            ordered_nodes = [node for node in ordered_nodes if node.id in required]
+            if pruned:
+                await self.notify({"type": "nodes_pruned", "data": {"pruned": pruned}})
+        else:
+            required = {node.id for node in ordered_nodes}
+
+        run = RunState(
+            results=ResultStore(
+                memory_budget=self.memory_budget,
+                spill_threshold=self.spill_threshold,
+                shared=self.shared_memory,
+            ),
+            wiring=self.compile_wiring(),
+            reads=Counter(
+                edge["source"] for edge in self.edges if edge["target"] in required
+            ),
+        )
+        run.results.pinned.update(retain or [])
+        saved = set()
+        if run_id and self.checkpoints:
+            run.run_id = run_id
+            run.fingerprints = self.node_fingerprints()
+            if resume:
+                saved = await self.checkpoints.completed(run_id)
+
+        status = "error"  # Unless the loop below finishes
+        try:
+            for node in ordered_nodes:
+                if node.id in run.completed:
+                    continue  # Already ran as part of a loop body
+                is_loop = bool(getattr(node.python_class, "feedback_inputs", None))
+                group = [node] + self.loop_body(node, ordered_nodes) if is_loop else [node]
+                if saved and await self.resume_nodes(group, run, saved):
+                    continue
+                failed_sources = [
+                    conn["node"].id
+                    for member in group
+                    for conn in run.wiring[member.id]
+                    if conn["node"].id in run.failed and conn["node"] not in group
+                ]
+                if failed_sources:
+                    await self.end_failed(group, run, "skipped", cause=failed_sources[0])
+                    continue
+                try:
+                    if is_loop:
+                        await self.execute_loop(node, ordered_nodes, run)
+                    else:
+                        await self.execute_one(node, run)
+                except Exception as e:
+                    if self.failure_policy != "isolate":
+                        raise
+                    await self.end_failed(group, run, "failed", error=str(e))
+                    continue
+                run.completed.add(node.id)
+                run.outcomes.update((member.id, {"status": "success"}) for member in group)
+                await self.checkpoint_nodes(group, run)
+                if is_loop:
+                    self.consume_inputs(group, run)
+
+            retained = await run.results.retained()
+            self.last_results = retained
+            self.last_run_stats = run.results.stats()
+            if run.run_id:
+                self.last_run_stats.update(run_id=run.run_id, resumed_nodes=run.resumed)
+            status = "failed" if run.failed else "success"
+        finally:
+            run.results.close()
+            # Checkpoints of nodes finished before an error are kept for resuming
+            await asyncio.gather(*run.checkpoint_tasks)
+            if self.history:
+                self.history.record(
+                    "flow",
+                    run.history,
+                    started,
+                    time.perf_counter() - start,
+                    status,
+                    run_id=run.run_id,
+                    session_id=self.connection_id,
+                    flow=self.flow_fingerprint(),
                 )
 
-            except Exception as e:
-                print(f"Error executing node {node.label}: {str(e)}")
-                raise
+        self.last_outcomes = run.outcomes
+        await self.notify({"type": "run_stats", "data": self.last_run_stats})
+        await self.notify({"type": "node_outcomes", "data": run.outcomes})
+        return retained
 
-        return node_results
+    async def end_failed(
+        self,
+        group: List[ReactflowNode],
+        run: RunState,
+        status: str,
+        error: Optional[str] = None,
+        cause: Optional[str] = None,
+    ):
+        """
+        Records a failed node (or loop and body), or one skipped because an
+        upstream node failed, and releases what it held so independent
+        branches carry on.
+        """
+        for index, member in enumerate(group):
+            if index == 0:
+                outcome = {"status": status, "error": error, "cause": cause}
+            else:
+                outcome = {"status": "skipped", "error": None, "cause": group[0].id}
+            run.outcomes[member.id] = {k: v for k, v in outcome.items() if v is not None}
+            run.failed.add(member.id)
+            run.completed.add(member.id)
+            if member.id in run.results:
+                run.results.release(member.id)  # Partial loop results
+            for conn in run.wiring[member.id]:
+                if conn["node"] not in group:
+                    run.results.consume(conn["node"].id)
+            if outcome["status"] == "skipped":  # Failed nodes already reported run_failed
+                await self.notify(
+                    {
+                        "type": "node_message",
+                        "data": {
+                            "nodeId": member.id,
+                            "message": {"type": "status", "data": "run_skipped"},
+                        },
+                    }
+                )
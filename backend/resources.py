@@ -0,0 +1,109 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+MEMORY = "memory"  # Pool of bytes, charged with Node.memory_estimate
+
+
+def parse_capacities(spec: str) -> Dict[str, int]:
+    """Reads "ollama:2,cpu:8" into {"ollama": 2, "cpu": 8}"""
+    capacities = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, count = item.partition(":")
+        capacities[name.strip()] = int(count or 1)
+    return capacities
+
+
+class ResourcePools:
+    """
+    Named pools of slots node executions hold while they run, e.g. the
+    concurrent generations an Ollama server can serve or the CPU cores for
+    image processing. A node gets all the slots it declares at once or waits
+    holding none, so nodes needing several resources cannot deadlock each
+    other. Resources without a pool are unlimited.
+    """
+
+    def __init__(self, capacities: Dict[str, int]):
+        self.capacities = dict(capacities)
+        self.in_use: Dict[str, int] = {name: 0 for name in capacities}
+        self.condition = asyncio.Condition()
+        self.waiting = 0
+        self.waits = 0
+        self.total_wait = 0.0
+
+    def requirements(self, resources: Dict[str, int], memory: int = 0) -> Dict[str, int]:
+        """The declared resources that have a pool, checked against its capacity"""
+        needed = {
+            name: count
+            for name, count in resources.items()
+            if name in self.capacities and count > 0
+        }
+        if memory and MEMORY in self.capacities:
+            needed[MEMORY] = memory
+        for name, count in needed.items():
+            if count > self.capacities[name]:
+                # Would never be granted, waiting for it would hang forever
+                raise ValueError(
+                    f"Needs {count} {name} but the pool only has {self.capacities[name]}"
+                )
+        return needed
+
+    def available(self, needed: Dict[str, int]) -> bool:
+        return all(
+            self.in_use[name] + count <= self.capacities[name]
+            for name, count in needed.items()
+        )
+
+    def take(self, needed: Dict[str, int]):
+        for name, count in needed.items():
+            self.in_use[name] += count
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        resources: Dict[str, int],
+        memory: int = 0,
+        on_wait: Optional[Callable[[], Awaitable]] = None,
+    ):
+        """Holds the slots for resources (and memory bytes) for the duration"""
+        needed = self.requirements(resources, memory)
+        if not needed:
+            yield
+            return
+        if not self.available(needed):
+            if on_wait:
+                await on_wait()
+            start = time.monotonic()
+            self.waiting += 1
+            try:
+                async with self.condition:
+                    await self.condition.wait_for(lambda: self.available(needed))
+                    self.take(needed)
+            finally:
+                self.waiting -= 1
+            self.waits += 1
+            self.total_wait += time.monotonic() - start
+        else:
+            self.take(needed)  # Nothing awaited since the check, so still free
+        try:
+            yield
+        finally:
+            for name, count in needed.items():
+                self.in_use[name] -= count
+            async with self.condition:
+                self.condition.notify_all()
+
+    def stats(self) -> Dict:
+        return {
+            "pools": {
+                name: {"capacity": capacity, "in_use": self.in_use[name]}
+                for name, capacity in self.capacities.items()
+            },
+            "waiting": self.waiting,
+            "waits": self.waits,
+            "total_wait": round(self.total_wait, 4),
+        }
+
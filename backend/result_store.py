@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+import os
+import pickle
+import resource
+import sys
+import tempfile
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, List, Optional
+
+
+def estimate_size(value: Any) -> int:
+    """Cheap estimate of the memory held by a node result, in bytes"""
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (list, tuple, set)):
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if is_dataclass(value) and not isinstance(value, type):
+        return sum(estimate_size(getattr(value, f.name)) for f in fields(value))
+    return sys.getsizeof(value)
+
+
+def spill_value(value: Any, spill_dir: Optional[str]) -> str:
+    fd, path = tempfile.mkstemp(prefix="noder_spill_", dir=spill_dir)
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def load_spilled(path: str) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class ResultStore:
+    """
+    Holds the outputs of one graph run. A node's outputs are released as soon as
+    every consumer has read them, and when a memory budget is set, values are
+    spilled to temporary files and reloaded when a consumer asks for them:
+    the largest first, then the least recently used if that is not enough.
+    """
+
+    def __init__(
+        self,
+        memory_budget: Optional[int] = None,
+        spill_threshold: int = 1024 * 1024,
+        spill_dir: Optional[str] = None,
+        shared=None,
+    ):
+        self.memory_budget = memory_budget  # Bytes kept in memory before spilling
+        # SharedMemoryTransport whose segments live as long as the results holding them
+        self.shared = shared
+        self.spill_threshold = spill_threshold  # Smallest value spilled before LRU ones
+        self.spill_dir = spill_dir
+        self.results: Dict[str, List[Any]] = {}
+        self.sizes: Dict[tuple, int] = {}  # (node_id, index) -> bytes in memory
+        self.spilled: Dict[tuple, str] = {}  # (node_id, index) -> file path
+        self.remaining_reads: Dict[str, int] = {}
+        self.pinned = set()  # Node ids kept until the end of the run, e.g. in loops
+        self.clock = itertools.count()
+        self.last_used: Dict[str, int] = {}  # node_id -> clock at the last put or get
+        self.memory_in_use = 0
+        self.peak_memory = 0
+        self.spill_count = 0
+        self.released_count = 0
+        self.spilling = False
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.results
+
+    async def put(self, node_id: str, values: List[Any], reads: int):
+        """Stores a node's outputs, which will be read `reads` times"""
+        if node_id in self.results:
+            self._drop(node_id)  # A loop pass replacing the previous outputs
+        self.results[node_id] = list(values)
+        self.remaining_reads[node_id] = reads
+        self.last_used[node_id] = next(self.clock)
+        if self.shared:
+            self.shared.retain(values)
+        for index, value in enumerate(values):
+            size = estimate_size(value)
+            self.sizes[(node_id, index)] = size
+            self.memory_in_use += size
+        self.peak_memory = max(self.peak_memory, self.memory_in_use)
+        if self.memory_budget is not None and self.memory_in_use > self.memory_budget:
+            await self._spill()
+
+    async def get(self, node_id: str) -> List[Any]:
+        values = list(self.results[node_id])
+        self.last_used[node_id] = next(self.clock)
+        for index in range(len(values)):
+            path = self.spilled.get((node_id, index))
+            if path:
+                values[index] = await asyncio.to_thread(load_spilled, path)
+        return values
+
+    def consume(self, node_id: str):
+        """Records one read of a node's outputs, releasing them after the last"""
+        if node_id not in self.remaining_reads or node_id in self.pinned:
+            return
+        self.remaining_reads[node_id] -= 1
+        if self.remaining_reads[node_id] <= 0:
+            self.release(node_id)
+
+    def release(self, node_id: str):
+        self._drop(node_id)
+        self.released_count += 1
+
+    def _drop(self, node_id: str):
+        values = self.results.pop(node_id, [])
+        self.remaining_reads.pop(node_id, None)
+        self.last_used.pop(node_id, None)
+        if self.shared:
+            self.shared.release(values)
+        for index in range(len(values)):
+            self.memory_in_use -= self.sizes.pop((node_id, index), 0)
+            path = self.spilled.pop((node_id, index), None)
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    async def _spill(self):
+        """
+        Moves in-memory values to disk until back under budget: those of at
+        least spill_threshold bytes largest first, then the least recently
+        used of the rest, so many mid-sized values still respect the budget.
+        Files are written in a thread; a value released or replaced meanwhile
+        just has its file removed again.
+        """
+        if self.spilling:
+            return  # The spill in progress keeps going until under budget
+        self.spilling = True
+        try:
+            await self._spill_values()
+        finally:
+            self.spilling = False
+
+    async def _spill_values(self):
+        in_memory = [
+            (size, key)
+            for key, size in self.sizes.items()
+            if size > 0 and key not in self.spilled
+        ]
+        largest = sorted(
+            (c for c in in_memory if c[0] >= self.spill_threshold), reverse=True
+        )
+        least_recent = sorted(
+            (c for c in in_memory if c[0] < self.spill_threshold),
+            key=lambda c: self.last_used[c[1][0]],
+        )
+        for size, (node_id, index) in largest + least_recent:
+            if self.memory_in_use <= self.memory_budget:
+                break
+            values = self.results.get(node_id)
+            if values is None or (node_id, index) in self.spilled:
+                continue  # Released or spilled while an earlier file was written
+            value = values[index]
+            path = await asyncio.to_thread(spill_value, value, self.spill_dir)
+            if self.results.get(node_id) is not values or values[index] is not value:
+                os.remove(path)
+                continue
+            values[index] = None
+            self.spilled[(node_id, index)] = path
+            self.sizes[(node_id, index)] = 0
+            self.memory_in_use -= size
+            self.spill_count += 1
+
+    async def retained(self) -> Dict[str, List[Any]]:
+        """Results still held (graph sinks and pinned nodes), loaded back into memory"""
+        return {node_id: await self.get_local(node_id) for node_id in list(self.results)}
+
+    async def get_local(self, node_id: str) -> List[Any]:
+        """Like get, with shared memory handles copied back into this process"""
+        values = await self.get(node_id)
+        return self.shared.resolve(values) if self.shared else values
+
+    def close(self):
+        for node_id in list(self.results):
+            self.release(node_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "peak_result_bytes": self.peak_memory,
+            "spilled_values": self.spill_count,
+            "released_nodes": self.released_count,
+            # ru_maxrss is the process high-water mark in kilobytes on Linux
+            "process_peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
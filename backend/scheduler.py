@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+# Priorities, lower runs first
+INTERACTIVE = 0  # run_node / button calls the user is waiting on
+FLOW = 1  # nodes of a full process_flow run
+# Node runs mostly await I/O (HTTP, Ollama, delays) or hold a "cpu" resource
+# slot for heavy work, so the default cap is well above the core count
+DEFAULT_MAX_CONCURRENT = max(32, 4 * (os.cpu_count() or 1))
+
+
+class Scheduler:
+    """
+    Server-wide gate every node execution passes through. At most
+    max_concurrent nodes run at once; waiting executions are served by
+    priority, then round-robin across connections so one large flow cannot
+    starve everyone else.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None):
+        self.max_concurrent = max_concurrent or DEFAULT_MAX_CONCURRENT
+        self.running = 0
+        # priority -> connection -> waiting (future, enqueued_at)
+        self.queues: Dict[int, "OrderedDict[str, deque]"] = {
+            INTERACTIVE: OrderedDict(),
+            FLOW: OrderedDict(),
+        }
+        self.started = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self, connection_id: str, priority: int = FLOW):
+        await self.acquire(connection_id, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, connection_id: str, priority: int = FLOW):
+        if self.running < self.max_concurrent and not self.queue_depth():
+            self.running += 1
+            self._record_wait(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        item = (future, time.monotonic())
+        waiters = self.queues[priority].setdefault(connection_id, deque())
+        waiters.append(item)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # The slot was granted as we were cancelled
+            elif item in waiters:
+                waiters.remove(item)
+                if not waiters and self.queues[priority].get(connection_id) is waiters:
+                    del self.queues[priority][connection_id]
+            raise
+
+    def release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent:
+            item = self._next_waiter()
+            if item is None:
+                break
+            future, enqueued_at = item
+            if future.done():
+                continue
+            self.running += 1
+            self._record_wait(time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+    def _next_waiter(self):
+        for priority in sorted(self.queues):
+            connections = self.queues[priority]
+            if not connections:
+                continue
+            connection_id, waiters = next(iter(connections.items()))
+            item = waiters.popleft()
+            if not waiters:
+                del connections[connection_id]
+            else:
+                connections.move_to_end(connection_id)  # Next connection's turn
+            return item
+        return None
+
+    def _record_wait(self, wait: float):
+        self.started += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def queue_depth(self, connection_id: Optional[str] = None) -> int:
+        return sum(
+            len(waiters)
+            for connections in self.queues.values()
+            for conn, waiters in connections.items()
+            if connection_id is None or conn == connection_id
+        )
+
+    def stats(self, connection_id: Optional[str] = None) -> Dict:
+        stats = {
+            "max_concurrent": self.max_concurrent,
+            "running": self.running,
+            "queue_depth": self.queue_depth(),
+            "queue_depth_by_priority": {
+                "interactive": sum(len(w) for w in self.queues[INTERACTIVE].values()),
+                "flow": sum(len(w) for w in self.queues[FLOW].values()),
+            },
+            "started": self.started,
+            "avg_wait_ms": round(self.total_wait / self.started * 1000, 2)
+            if self.started
+            else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+        if connection_id is not None:
+            stats["connection_queue_depth"] = self.queue_depth(connection_id)
+        return stats
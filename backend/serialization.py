@@ -0,0 +1,111 @@
+"""
+Encoding of websocket messages and flow files.
+
+JSON goes through orjson when it is installed and the standard library
+otherwise. Clients may ask for MessagePack frames by connecting with
+?encoding=msgpack. In that mode, data URLs in either direction travel as
+{"$bin": <raw bytes>, "mime": <type>} maps in binary frames instead of
+base64 text. Clients that ask for nothing, or for msgpack when it is not
+installed, get JSON text frames as before.
+"""
+
+import base64
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def dumps(value: Any) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode()
+        except TypeError:
+            pass  # e.g. non-string dict keys, which the json module coerces
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_flow(path: str) -> Any:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump_flow(value: Any, path: str):
+    """Writes an indented flow file, readable and diffable like before"""
+    if orjson is not None:
+        try:
+            data = orjson.dumps(value, option=orjson.OPT_INDENT_2)
+            with open(path, "wb") as f:
+                f.write(data)
+            return
+        except TypeError:
+            pass
+    with open(path, "w") as f:
+        json.dump(value, f, indent=2)
+
+
+def _pack_data_urls(value: Any) -> Any:
+    if isinstance(value, str) and value.startswith("data:") and ";base64," in value:
+        header, data = value.split(",", 1)
+        return {"$bin": base64.b64decode(data), "mime": header[5:-7]}
+    if isinstance(value, dict):
+        return {k: _pack_data_urls(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_pack_data_urls(item) for item in value]
+    return value
+
+
+def _unpack_data_urls(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$bin" in value and isinstance(value["$bin"], bytes):
+            encoded = base64.b64encode(value["$bin"]).decode()
+            return f"data:{value.get('mime', 'application/octet-stream')};base64,{encoded}"
+        return {k: _unpack_data_urls(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unpack_data_urls(item) for item in value]
+    return value
+
+
+class JsonCodec:
+    name = "json"
+    binary = False
+
+    def encode(self, value: Any) -> str:
+        return dumps(value)
+
+    def decode(self, data: Union[str, bytes]) -> Any:
+        return loads(data)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    binary = True
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(_pack_data_urls(value), use_bin_type=True, default=str)
+
+    def decode(self, data: Union[str, bytes]) -> Any:
+        if isinstance(data, str):
+            return loads(data)  # Text frames stay JSON
+        return _unpack_data_urls(msgpack.unpackb(data, raw=False))
+
+
+def negotiate(requested: str = None):
+    """The codec for a client's ?encoding=, JSON unless msgpack was asked for and is available"""
+    if requested == "msgpack" and msgpack is not None:
+        return MsgpackCodec()
+    return JsonCodec()
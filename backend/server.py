@@ -3,20 +3,172 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, JSONResponse
-from typing import List, Dict
+from collections import OrderedDict
+from typing import List, Dict, Optional
+import asyncio
 import os
 import json
-from noderizer import get_python_classes
+import time
+import uuid
+from noderizer import get_python_classes, preload_node_classes
 from pathlib import Path
 
+from accounting import Accounting, MeteredWebSocket, QuotaExceeded, Quotas
+from checkpoint import CheckpointStore
+from coalescing import FlowCoalescer
+from flow_api import GraphPool, create_flow_router, flow_key
+from history import HistoryStore
+from output_writer import get_output_writer
 from react_flowgraph import ReactflowGraph
+from resources import MEMORY, ResourcePools, parse_capacities
+from scheduler import Scheduler
+import serialization
+from shm_transport import SharedMemoryTransport
+from singleflight import SingleFlight
+from worker_pool import WorkerPool
+from validation import FlowValidationError
 
 from datetime import datetime
 from fastapi import UploadFile, HTTPException
 
 SAVED_FLOWS_DIR = "../user/saved_flows"
+# Intermediate results above this many megabytes per run spill to disk
+MEMORY_BUDGET_MB = os.environ.get("NODER_MEMORY_BUDGET_MB")
+# Values of at least this many KB spill first, smaller ones only when that is not enough
+SPILL_THRESHOLD_KB = float(os.environ.get("NODER_SPILL_THRESHOLD_KB", 1024))
+# Seconds a disconnected session's graph is kept for the client to reconnect
+SESSION_TTL = float(os.environ.get("NODER_SESSION_TTL", 300))
+MAX_SESSIONS = int(os.environ.get("NODER_MAX_SESSIONS", 100))
+MAX_PARKED_BYTES = (
+    int(float(os.environ["NODER_MAX_PARKED_MB"]) * 1024 * 1024)
+    if os.environ.get("NODER_MAX_PARKED_MB")
+    else None
+)
+# Comma separated worker addresses, e.g. "tcp://10.0.0.5:9001,unix:///tmp/worker.sock"
+WORKERS = [a.strip() for a in os.environ.get("NODER_WORKERS", "").split(",") if a.strip()]
+# Values of at least this many KB pass to and from local workers in shared memory
+SHM_THRESHOLD_KB = os.environ.get("NODER_SHM_THRESHOLD_KB", "1024")
+shared_memory = (
+    SharedMemoryTransport(int(float(SHM_THRESHOLD_KB) * 1024))
+    if WORKERS and SHM_THRESHOLD_KB != "0"
+    else None
+)
+worker_pool = WorkerPool(WORKERS, transport=shared_memory) if WORKERS else None
+
+# Describe node modules from source and import each on first use, "0" imports all up front
+LAZY_IMPORTS = os.environ.get("NODER_LAZY_IMPORTS", "1").lower() not in ("0", "false")
+# Node classes imported at startup anyway, e.g. "String,ShowText", or "*" for all
+PRELOAD_NODES = [
+    n.strip() for n in os.environ.get("NODER_PRELOAD_NODES", "").split(",") if n.strip()
+]
+python_classes = get_python_classes(lazy=LAZY_IMPORTS)
+# Shared by every connection so identical concurrent node runs execute once
+single_flight = SingleFlight()
+# Global cap and fair queuing for node executions across all connections
+scheduler = Scheduler(
+    int(os.environ["NODER_MAX_CONCURRENT_NODES"])
+    if os.environ.get("NODER_MAX_CONCURRENT_NODES")
+    else None
+)
+# "isolate" lets branches independent of a failed node finish, "abort" stops the run
+FAILURE_POLICY = os.environ.get("NODER_FAILURE_POLICY", "isolate")
+# Skip nodes that feed no output node (ShowText, SaveImage, ...) unless asked for
+LAZY_EVALUATION = os.environ.get("NODER_LAZY_EVALUATION", "").lower() in ("1", "true")
+# Quiet period before the newest of a burst of process_flow messages runs
+FLOW_DEBOUNCE = float(os.environ.get("NODER_FLOW_DEBOUNCE_MS", 50)) / 1000
+# Saved flows instantiated on startup for the HTTP API, e.g. "example.json"
+PREWARM_FLOWS = [
+    f.strip() for f in os.environ.get("NODER_PREWARM_FLOWS", "").split(",") if f.strip()
+]
+
+# Per-session quotas, unset means unlimited. "throttle" delays work over a
+# quota, "reject" refuses it with an error message.
+accounting = Accounting(
+    Quotas(
+        cpu_seconds=float(os.environ["NODER_QUOTA_CPU_SECONDS"])
+        if os.environ.get("NODER_QUOTA_CPU_SECONDS")
+        else None,
+        bytes_in=int(float(os.environ["NODER_QUOTA_UPLOAD_MB"]) * 1024 * 1024)
+        if os.environ.get("NODER_QUOTA_UPLOAD_MB")
+        else None,
+        window=float(os.environ.get("NODER_QUOTA_WINDOW", 60)),
+        max_in_flight=int(os.environ["NODER_QUOTA_MAX_IN_FLIGHT"])
+        if os.environ.get("NODER_QUOTA_MAX_IN_FLIGHT")
+        else None,
+        max_retained_bytes=int(float(os.environ["NODER_QUOTA_RETAINED_MB"]) * 1024 * 1024)
+        if os.environ.get("NODER_QUOTA_RETAINED_MB")
+        else None,
+        mode=os.environ.get("NODER_QUOTA_MODE", "throttle"),
+    )
+)
 
-python_classes = get_python_classes()
+# Save each completed node's outputs so a flow can resume after a restart
+CHECKPOINTS = os.environ.get("NODER_CHECKPOINTS", "").lower() in ("1", "true")
+checkpoint_store = (
+    CheckpointStore(
+        os.environ.get("NODER_CHECKPOINT_DIR", "../user/checkpoints"),
+        max_age=float(os.environ.get("NODER_CHECKPOINT_MAX_AGE_HOURS", 24)) * 3600,
+        max_runs=int(os.environ.get("NODER_CHECKPOINT_MAX_RUNS", 100)),
+    )
+    if CHECKPOINTS
+    else None
+)
+
+# Slots node classes declare in Node.resources, e.g. "ollama:2,cpu:8". cpu
+# defaults to the core count; NODER_RESOURCE_MEMORY_MB adds a memory pool
+# charged with Node.memory_estimate.
+resource_pools = ResourcePools(
+    {
+        "cpu": os.cpu_count() or 4,
+        **parse_capacities(os.environ.get("NODER_RESOURCES", "")),
+        **(
+            {MEMORY: int(float(os.environ["NODER_RESOURCE_MEMORY_MB"]) * 1024 * 1024)}
+            if os.environ.get("NODER_RESOURCE_MEMORY_MB")
+            else {}
+        ),
+    }
+)
+
+# Record every run's node timings, sizes and outcomes in a SQLite database
+HISTORY = os.environ.get("NODER_HISTORY", "").lower() in ("1", "true")
+history_store = (
+    HistoryStore(
+        os.environ.get("NODER_HISTORY_DB", "../user/history.db"),
+        max_age=float(os.environ.get("NODER_HISTORY_MAX_AGE_DAYS", 30)) * 24 * 3600,
+        max_runs=int(os.environ.get("NODER_HISTORY_MAX_RUNS", 10000)),
+    )
+    if HISTORY
+    else None
+)
+
+
+def create_graph(connection_id: Optional[str] = None) -> ReactflowGraph:
+    graph = ReactflowGraph(
+        {"nodes": [], "edges": []},
+        python_classes,
+        memory_budget=int(float(MEMORY_BUDGET_MB) * 1024 * 1024)
+        if MEMORY_BUDGET_MB
+        else None,
+        spill_threshold=int(SPILL_THRESHOLD_KB * 1024),
+        single_flight=single_flight,
+        scheduler=scheduler,
+        connection_id=connection_id,
+        worker_pool=worker_pool,
+    )
+    graph.lazy_evaluation = LAZY_EVALUATION
+    graph.checkpoints = checkpoint_store
+    graph.failure_policy = FAILURE_POLICY
+    graph.history = history_store
+    graph.resources = resource_pools
+    return graph
+
+
+# Warm graphs for flows executed over HTTP
+graph_pool = GraphPool(
+    lambda: create_graph("http_api"),
+    max_concurrent=int(os.environ.get("NODER_API_CONCURRENCY", 8)),
+    max_queued=int(os.environ.get("NODER_API_MAX_QUEUED", 64)),
+)
 
 app = FastAPI()
 
@@ -33,6 +185,8 @@ app.add_middleware(
 # Mount static files from the dist directory
 app.mount("/assets", StaticFiles(directory="../frontend/dist/assets"), name="assets")
 app.mount("/saved_flows", StaticFiles(directory=SAVED_FLOWS_DIR), name="saved_flows")
+# Registered before the catch-all GET route below so it is not shadowed
+app.include_router(create_flow_router(graph_pool, SAVED_FLOWS_DIR))
 
 
 @app.get("/")
@@ -40,6 +194,60 @@ async def read_root():
     return FileResponse("../frontend/dist/index.html")
 
 
+@app.get("/scheduler_stats")
+async def scheduler_stats():
+    return {
+        "status": "success",
+        "stats": scheduler.stats(),
+        "resources": resource_pools.stats(),
+    }
+
+
+@app.get("/workers")
+async def workers():
+    return {
+        "status": "success",
+        "workers": worker_pool.stats() if worker_pool else [],
+        "shared_memory": shared_memory.stats() if shared_memory else None,
+    }
+
+
+@app.get("/admin/sessions")
+async def heaviest_sessions(limit: int = 10, sort: str = "cpu_seconds"):
+    """Sessions using the most of a resource, e.g. ?sort=bytes_in&limit=5, by id digest"""
+    try:
+        sessions = accounting.heaviest(limit, sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "sessions": sessions}
+
+
+@app.get("/history/regressions")
+async def history_regressions(
+    recent_hours: float = 24,
+    baseline_days: float = 14,
+    threshold: float = 1.5,
+    min_samples: int = 5,
+):
+    """Node classes whose recent median run time regressed against their baseline"""
+    if not history_store:
+        raise HTTPException(status_code=404, detail="History is disabled")
+    regressions = await history_store.regressions(
+        recent_hours=recent_hours,
+        baseline_days=baseline_days,
+        threshold=threshold,
+        min_samples=min_samples,
+    )
+    return {"status": "success", "regressions": regressions}
+
+
+@app.get("/history/runs")
+async def history_runs(limit: int = 20):
+    if not history_store:
+        raise HTTPException(status_code=404, detail="History is disabled")
+    return {"status": "success", "runs": await history_store.recent_runs(limit)}
+
+
 @app.get("/{catch_all:path}")
 async def catch_all(catch_all: str):
     base_dir = Path("../frontend/dist")
@@ -52,59 +260,292 @@ async def catch_all(catch_all: str):
     return FileResponse("../frontend/dist/index.html")
 
 
+class Session:
+    def __init__(self, session_id: str, graph: ReactflowGraph):
+        self.session_id = session_id
+        self.graph = graph
+        self.websocket = None
+        self.parked_at = None  # Monotonic time the client went away, None while attached
+        self.usage = accounting.usage_for(session_id)
+        self.usage.retained_size = graph.estimated_size
+        graph.usage = self.usage
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[WebSocket, ReactflowGraph] = {}
+    """
+    Graphs belong to sessions rather than sockets. When a client disconnects its
+    session is parked for session_ttl seconds so a refresh or network blip can
+    re-attach to the warm graph. Parked sessions are evicted least recently used
+    first once max_sessions or max_parked_bytes is exceeded.
+    """
+
+    def __init__(
+        self,
+        session_ttl: float = SESSION_TTL,
+        max_sessions: int = MAX_SESSIONS,
+        max_parked_bytes: Optional[int] = MAX_PARKED_BYTES,
+    ):
+        self.active_connections: Dict[WebSocket, Session] = {}
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
         self.python_classes = python_classes
-
-    async def connect(self, websocket: WebSocket):
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.max_parked_bytes = max_parked_bytes
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        session_id: Optional[str] = None,
+        encoding: Optional[str] = None,
+    ):
         await websocket.accept()
-        # Create a new graph instance for this connection
-        self.active_connections[websocket] = ReactflowGraph(
-            {"nodes": [], "edges": []}, self.python_classes
+        self.evict_sessions()
+
+        session = self.sessions.get(session_id) if session_id else None
+        if session and session.websocket is None:
+            print(f"Session {session_id} reattached")
+            session.parked_at = None
+        else:
+            # Create a new graph instance for this connection
+            session_id = uuid.uuid4().hex
+            session = Session(session_id, create_graph(session_id))
+            self.sessions[session.session_id] = session
+
+        codec = serialization.negotiate(encoding)
+        websocket = MeteredWebSocket(websocket, session.usage, codec)
+        session.websocket = websocket
+        session.graph.attach_websocket(websocket)
+        self.sessions.move_to_end(session.session_id)
+        self.active_connections[websocket] = session
+        self.evict_sessions()
+        await websocket.send_json(
+            {
+                "type": "session",
+                # Tells the client which encoding it actually got
+                "data": {"session_id": session.session_id, "encoding": codec.name},
+            }
         )
+        return session
 
     def disconnect(self, websocket: WebSocket):
         print("Client disconnected")
-        if websocket in self.active_connections:
-            del self.active_connections[websocket]
+        session = self.active_connections.pop(websocket, None)
+        if session:
+            session.websocket = None
+            session.parked_at = time.monotonic()
+            session.graph.attach_websocket(None)
+        self.evict_sessions()
 
     def get_graph(self, websocket: WebSocket) -> ReactflowGraph:
-        return self.active_connections[websocket]
+        session = self.active_connections[websocket]
+        self.sessions.move_to_end(session.session_id)
+        return session.graph
+
+    def evict_sessions(self):
+        """Drops expired parked sessions, then the least recently used ones over the caps"""
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if session.parked_at is not None and now - session.parked_at > self.session_ttl:
+                self.forget_session(session_id)
+
+        parked = [s for s in self.sessions.values() if s.parked_at is not None]
+        parked_bytes = (
+            sum(s.graph.estimated_size() for s in parked)
+            if self.max_parked_bytes is not None
+            else 0
+        )
+        for session in parked:  # OrderedDict order is least recently used first
+            over_count = len(self.sessions) > self.max_sessions
+            over_memory = (
+                self.max_parked_bytes is not None
+                and parked_bytes > self.max_parked_bytes
+            )
+            if not over_count and not over_memory:
+                break
+            if over_memory:
+                parked_bytes -= session.graph.estimated_size()
+            self.forget_session(session.session_id)
+            print(f"Session {session.session_id} evicted")
+
+    def forget_session(self, session_id: str):
+        self.sessions.pop(session_id).graph.close()
+        accounting.forget(session_id)
+        if worker_pool:
+            asyncio.get_running_loop().create_task(worker_pool.release(session_id))
+
+    async def sweep_sessions(self, interval: float = 30):
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_sessions()
 
 
 manager = ConnectionManager()
 
 
+@app.on_event("startup")
+async def start_session_sweeper():
+    asyncio.create_task(manager.sweep_sessions())
+
+
+@app.on_event("startup")
+async def start_checkpoint_sweeper():
+    if checkpoint_store:
+        asyncio.create_task(checkpoint_store.sweep())
+
+
+@app.on_event("startup")
+async def start_worker_pool():
+    if worker_pool:
+        await worker_pool.start()
+
+
+@app.on_event("startup")
+async def preload_nodes():
+    if PRELOAD_NODES:
+        await asyncio.to_thread(preload_node_classes, python_classes, PRELOAD_NODES)
+
+
+@app.on_event("startup")
+async def prewarm_api_flows():
+    for filename in PREWARM_FLOWS:
+        try:
+            flow = serialization.load_flow(os.path.join(SAVED_FLOWS_DIR, filename))
+            await graph_pool.prewarm(flow)
+            print(f"Prewarmed {filename}")
+        except Exception as e:
+            print(f"Error prewarming {filename}: {str(e)}")
+
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    if worker_pool:
+        await worker_pool.stop()
+    if shared_memory:
+        shared_memory.close()
+
+
+@app.on_event("shutdown")
+async def flush_output_writer():
+    await get_output_writer().close()
+
+
+@app.on_event("shutdown")
+async def flush_history():
+    if history_store:
+        await history_store.close()
+
+
+@app.on_event("shutdown")
+async def release_sessions():
+    """Lets node instances clean up, e.g. delete decoded video uploads"""
+    for session in manager.sessions.values():
+        session.graph.close()
+
+
+async def process_flow(session: Session, json_data: Dict):
+    """Runs one process_flow message, reporting the outcome to the client"""
+    websocket = session.websocket
+    graph = session.graph
+    if websocket is None:
+        return  # Disconnected while the flow was waiting
+    try:
+        # The previous results are replaced by this run, so they don't count
+        graph.last_results = {}
+        await session.usage.admit()
+        await graph.update_from_json(
+            json_data["data"], json_data.get("targets"), json_data.get("lazy")
+        )
+        await graph.execute_nodes(
+            targets=json_data.get("targets"),
+            lazy=json_data.get("lazy"),
+            # Without a run id, reruns of the same flow share checkpoints
+            run_id=json_data.get("run_id") or flow_key(json_data["data"]),
+            resume=json_data.get("resume", False),
+        )
+        failed = [
+            node_id
+            for node_id, outcome in graph.last_outcomes.items()
+            if outcome["status"] == "failed"
+        ]
+        if failed:
+            await websocket.send_json(
+                {
+                    "type": "error",
+                    "data": f"Graph completed with {len(failed)} failed node(s)",
+                }
+            )
+        else:
+            await websocket.send_json({"type": "success", "data": "Graph completed"})
+    except WebSocketDisconnect:
+        pass
+    except (FlowValidationError, QuotaExceeded) as e:
+        await websocket.send_json({"type": "error", "data": str(e)})
+    except Exception as e:
+        await websocket.send_json({"status": "error", "message": str(e)})
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    session = await manager.connect(
+        websocket,
+        websocket.query_params.get("session_id"),
+        websocket.query_params.get("encoding"),
+    )
+    websocket = session.websocket  # Counts the bytes going through it
+
+    async def superseded(message: Dict):
+        await websocket.send_json(
+            {
+                "type": "flow_superseded",
+                "data": {
+                    "request_id": message.get("request_id"),
+                    "superseded": flows.superseded,
+                },
+            }
+        )
+
+    # Only the newest of a burst of process_flow messages runs
+    flows = FlowCoalescer(
+        lambda message: process_flow(session, message), superseded, FLOW_DEBOUNCE
+    )
     try:
         while True:
             try:
-                data = await websocket.receive_text()
-                json_data = json.loads(data)
+                json_data = await websocket.receive_message()
                 # Get the connection-specific graph
                 graph = manager.get_graph(websocket)
                 graph.websocket = websocket
 
                 if json_data["type"] == "process_flow":
-                    await graph.update_from_json(json_data["data"])
-                    results = await graph.execute_nodes()
-                    await websocket.send_json(
-                        {"type": "success", "data": "Graph completed"}
-                    )
-                elif json_data["type"] == "run_node":
+                    await flows.submit(json_data)
+                    continue
+                # Everything else still runs after the flows sent before it
+                await flows.idle()
+                if json_data["type"] == "run_node":
                     await graph.initialize_node(json_data["data"])
                     results = await graph.execute_node(json_data["data"])
                 elif json_data["type"] == "init_node":
                     await graph.initialize_node(json_data["data"])
+                elif json_data["type"] == "scheduler_stats":
+                    await websocket.send_json(
+                        {
+                            "type": "scheduler_stats",
+                            "data": {
+                                **scheduler.stats(graph.connection_id),
+                                "resources": resource_pools.stats(),
+                                "flows": flows.stats(),
+                            },
+                        }
+                    )
 
             except WebSocketDisconnect:
                 break
+            except (FlowValidationError, QuotaExceeded) as e:
+                await websocket.send_json({"type": "error", "data": str(e)})
             except Exception as e:
                 await websocket.send_json({"status": "error", "message": str(e)})
     finally:
+        flows.cancel()
         manager.disconnect(websocket)
 
 
@@ -114,7 +555,8 @@ async def python_nodes_handler(request: Request):
     """Handles both POST and GET requests for python nodes."""
     try:
         python_classes_without_class = [
-            {k: v for k, v in d.items() if k != "class"} for d in python_classes
+            {k: v for k, v in d.items() if k not in ("class", "script_path")}
+            for d in python_classes
         ]
         return JSONResponse(
             content={"status": "success", "nodes": python_classes_without_class},
@@ -137,8 +579,7 @@ async def export_flow(flow_data: dict):
         filename = f"flow_{timestamp}.json"
         file_path = f"{SAVED_FLOWS_DIR}/{filename}"
 
-        with open(file_path, "w") as f:
-            json.dump(flow_data, f, indent=2)
+        serialization.dump_flow(flow_data, file_path)
 
         return {"status": "success", "filename": filename}
     except Exception as e:
@@ -155,7 +596,7 @@ async def import_flow(file: UploadFile):
         # Read and parse the file
         content = await file.read()
         try:
-            flow_data = json.loads(content)
+            flow_data = serialization.loads(content)
         except json.JSONDecodeError:
             raise HTTPException(status_code=400, detail="Invalid JSON file")
 
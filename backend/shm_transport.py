@@ -0,0 +1,195 @@
+"""
+Shared memory handles for large node values passed between the server and
+workers on the same machine.
+
+A worker writes a large output once into a multiprocessing.shared_memory
+segment and returns a SharedValue handle in its place. The server keeps the
+handle in the run's ResultStore, hands it on to the next worker as is, and
+only copies the value out when a node runs in the server process. Segments
+are reference counted by the ResultStores holding them and unlinked with
+the last one; whatever is still alive at shutdown is reported and removed.
+"""
+
+import os
+import pickle
+import uuid
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Tuple
+
+from result_store import estimate_size
+
+SEGMENT_PREFIX = "noder_"
+
+
+@dataclass(frozen=True)
+class SharedValue:
+    """Stands in for a value living in a shared memory segment"""
+
+    name: str
+    size: int
+    kind: str  # "str", "bytes" or "pickle"
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    segment = shared_memory.SharedMemory(name=name)
+    # Until Python 3.13 attaching registers the segment with this process'
+    # resource tracker, which would unlink it when this process exits
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def _encode(value: Any):
+    if isinstance(value, str):
+        return value.encode(), "str"
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value), "bytes"
+    return pickle.dumps(value, protocol=5), "pickle"
+
+
+def _decode(data: bytes, kind: str) -> Any:
+    if kind == "str":
+        return data.decode()
+    if kind == "bytes":
+        return data
+    return pickle.loads(data)
+
+
+def export_value(value: Any, threshold: int, prefix: str = SEGMENT_PREFIX) -> Any:
+    """
+    Moves large leaf values into new segments, keeping lists, tuples and
+    dicts as they are so mapping over list outputs still works. The caller
+    hands ownership of the segments to whoever receives the handles.
+    """
+    if isinstance(value, list):
+        return [export_value(item, threshold, prefix) for item in value]
+    if isinstance(value, tuple):
+        return tuple(export_value(item, threshold, prefix) for item in value)
+    if isinstance(value, dict):
+        return {k: export_value(v, threshold, prefix) for k, v in value.items()}
+    if isinstance(value, SharedValue) or estimate_size(value) < threshold:
+        return value
+    data, kind = _encode(value)
+    segment = shared_memory.SharedMemory(
+        name=f"{prefix}{uuid.uuid4().hex[:16]}", create=True, size=max(1, len(data))
+    )
+    resource_tracker.unregister(segment._name, "shared_memory")  # Owned by the receiver
+    segment.buf[: len(data)] = data
+    segment.close()
+    return SharedValue(segment.name, len(data), kind)
+
+
+def resolve_value(value: Any) -> Any:
+    """Copies every SharedValue in a value back into process memory"""
+    if isinstance(value, SharedValue):
+        segment = _attach(value.name)
+        try:
+            return _decode(bytes(segment.buf[: value.size]), value.kind)
+        finally:
+            segment.close()
+    if isinstance(value, list):
+        return [resolve_value(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(resolve_value(item) for item in value)
+    if isinstance(value, dict):
+        return {k: resolve_value(v) for k, v in value.items()}
+    return value
+
+
+def handles_in(value: Any):
+    if isinstance(value, SharedValue):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from handles_in(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from handles_in(item)
+
+
+class SharedMemoryTransport:
+    """Server side owner of the segments behind SharedValue handles"""
+
+    def __init__(self, threshold: int = 1024 * 1024):
+        self.threshold = threshold  # Smallest value worth a segment, in bytes
+        # Workers name their segments with this too, so orphans can be found
+        self.prefix = f"{SEGMENT_PREFIX}{os.getpid()}_"
+        self.refs: Dict[str, int] = {}  # Segment name -> ResultStores holding it
+        self.sizes: Dict[str, int] = {}
+        self.created = 0
+        self.unlinked = 0
+
+    def export(self, value: Any) -> Tuple[Any, List[str]]:
+        """
+        Exports a value the server holds, e.g. arguments for a worker. Returns
+        the exported value and the names of the segments created for it, which
+        the caller discards once the worker is done with them.
+        """
+        existing = {handle.name for handle in handles_in(value)}
+        exported = export_value(value, self.threshold, self.prefix)
+        created = [h.name for h in handles_in(exported) if h.name not in existing]
+        self.track(exported)
+        return exported, created
+
+    def track(self, value: Any):
+        """Takes ownership of segments a worker created, before any ResultStore holds them"""
+        for handle in handles_in(value):
+            if handle.name not in self.refs:
+                self.refs[handle.name] = 0
+                self.sizes[handle.name] = handle.size
+                self.created += 1
+
+    def discard(self, names: List[str]):
+        for name in names:
+            if not self.refs.get(name):
+                self.unlink(name)
+
+    def resolve(self, value: Any) -> Any:
+        return resolve_value(value)
+
+    def retain(self, value: Any):
+        self.track(value)
+        for handle in handles_in(value):
+            self.refs[handle.name] += 1
+
+    def release(self, value: Any):
+        for handle in handles_in(value):
+            self.refs[handle.name] = self.refs.get(handle.name, 1) - 1
+            if self.refs[handle.name] <= 0:
+                self.unlink(handle.name)
+
+    def unlink(self, name: str):
+        self.refs.pop(name, None)
+        self.sizes.pop(name, None)
+        try:
+            segment = shared_memory.SharedMemory(name=name)
+            segment.close()
+            segment.unlink()  # Also drops the tracker registration made on attach
+            self.unlinked += 1
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """
+        Unlinks segments still alive, which means a leak somewhere, including
+        ones workers created that never reached this process.
+        """
+        for name in list(self.refs):
+            print(
+                f"Shared memory leak: {name} ({self.sizes.get(name, 0)} bytes, "
+                f"{self.refs[name]} references) unlinked at shutdown"
+            )
+            self.unlink(name)
+        if os.path.isdir("/dev/shm"):
+            for name in os.listdir("/dev/shm"):
+                if name.startswith(self.prefix):
+                    print(f"Shared memory leak: orphaned {name} unlinked at shutdown")
+                    self.unlink(name)
+
+    def stats(self) -> Dict:
+        return {
+            "segments": len(self.refs),
+            "bytes": sum(self.sizes.values()),
+            "created": self.created,
+            "unlinked": self.unlinked,
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import pickle
+from typing import Dict, List, Optional
+
+
+def fingerprint(class_name: str, widgets: List, input_args: Dict) -> Optional[str]:
+    """Identifies a node execution by class, widget values and inputs"""
+    try:
+        payload = pickle.dumps(
+            (class_name, widgets, sorted(input_args.items())), protocol=4
+        )
+    except Exception:
+        return None  # Unpicklable inputs are never deduplicated
+    return hashlib.sha256(payload).hexdigest()
+
+
+class Flight:
+    """One in-flight execution that followers can join"""
+
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+        self.messages = []  # (message_type, data) the leader has sent so far
+        self.subscribers = []  # (websocket, node_id) of each follower
+
+    async def relay(self, message_type: str, data):
+        """Forwards a message from the leader's node to every follower's node"""
+        self.messages.append((message_type, data))
+        for websocket, node_id in list(self.subscribers):
+            await send_node_message(websocket, node_id, message_type, data)
+
+
+async def send_node_message(websocket, node_id, message_type, data):
+    if websocket:
+        await websocket.send_json(
+            {
+                "type": "node_message",
+                "data": {
+                    "nodeId": node_id,
+                    "message": {"type": message_type, "data": data},
+                },
+            }
+        )
+
+
+class SingleFlight:
+    """
+    Server-wide deduplication of identical node executions. The first caller
+    for a fingerprint runs the node; everyone arriving while it is still running
+    awaits the same result and receives its status and widget messages.
+    """
+
+    def __init__(self):
+        self.flights: Dict[str, Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def run(self, key: Optional[str], instance, call):
+        if key is None:
+            return await call()
+
+        flight = self.flights.get(key)
+        if flight:
+            self.followers += 1
+            flight.subscribers.append((instance.websocket, instance.node_id))
+            for message_type, data in list(flight.messages):
+                await send_node_message(
+                    instance.websocket, instance.node_id, message_type, data
+                )
+            try:
+                return await asyncio.shield(flight.future)
+            except asyncio.CancelledError:
+                if not flight.future.cancelled():
+                    raise  # This follower was cancelled, not the leader
+            # The leader was cancelled, so run it ourselves
+            return await self.run(key, instance, call)
+
+        self.leaders += 1
+        flight = Flight()
+        self.flights[key] = flight
+        instance.message_listeners.append(flight.relay)
+        try:
+            result = await call()
+            flight.future.set_result(result)
+            return result
+        except Exception as e:
+            flight.future.set_exception(e)
+            flight.future.exception()  # Mark retrieved when nobody is following
+            raise
+        except BaseException:
+            flight.future.cancel()
+            raise
+        finally:
+            del self.flights[key]
+            instance.message_listeners.remove(flight.relay)
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self.flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
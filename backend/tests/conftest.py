@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# Node directories and the user folder are resolved relative to backend/
+os.chdir(BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    from noderizer import get_python_classes
+
+    return get_python_classes(lazy=True)
@@ -0,0 +1,71 @@
+"""Helpers building flows the way the frontend sends them"""
+
+from typing import Dict, Optional
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    def node_messages(self, message_type: str):
+        return [
+            (m["data"]["nodeId"], m["data"]["message"]["data"])
+            for m in self.sent
+            if m["type"] == "node_message" and m["data"]["message"]["type"] == message_type
+        ]
+
+
+def node(node_id: str, label: str, catalog, widget_values: Optional[Dict] = None) -> Dict:
+    entry = next(c for c in catalog if c["name"] == label)
+    if widget_values is None:
+        widget_values = {w["name"]: w.get("value", "") for w in entry["widgets"]}
+    return {
+        "id": node_id,
+        "type": "pythonNode",
+        "data": {
+            "label": label,
+            "inputs": entry["inputs"],
+            "outputs": entry["outputs"],
+            "widgets": entry["widgets"],
+            "widgetValues": widget_values,
+        },
+    }
+
+
+def edge(source: str, source_handle: str, target: str, target_handle: str) -> Dict:
+    return {
+        "id": f"{source}.{source_handle}-{target}.{target_handle}",
+        "source": source,
+        "sourceHandle": source_handle,
+        "target": target,
+        "targetHandle": target_handle,
+    }
+
+
+def loop_with_outside_input(catalog):
+    """
+    A Repeat loop whose body (Bar) also reads a ReverseText outside the loop.
+    Listed in this order a plain topological sort puts the loop node before
+    ReverseText, so the body would run before its input exists.
+    """
+    return {
+        "nodes": [
+            node("s", "String", catalog, {"string": "ab"}),
+            node("a", "String", catalog, {"string": "xy"}),
+            node("L", "Repeat", catalog, {"iterations": 3}),
+            node("a2", "ReverseText", catalog),
+            node("B", "Bar", catalog),
+            node("st", "ShowText", catalog),
+        ],
+        "edges": [
+            edge("s", "string", "L", "initial"),
+            edge("a", "string", "a2", "text"),
+            edge("L", "value", "B", "BarInput"),
+            edge("a2", "reversed_text", "B", "BarInput2"),
+            edge("B", "BarOutput", "L", "feedback"),
+            edge("B", "BarOutput", "st", "text"),
+        ],
+    }
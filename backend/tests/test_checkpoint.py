@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from checkpoint import CheckpointStore
+from flows import FakeWebSocket, edge, node
+from react_flowgraph import ReactflowGraph
+
+
+@pytest.mark.parametrize("run_id", ["..", ".", "a/b", "../x", ""])
+def test_run_ids_cannot_leave_the_store(tmp_path, run_id):
+    store = CheckpointStore(str(tmp_path / "checkpoints"))
+    with pytest.raises(ValueError):
+        store.run_dir(run_id)
+
+
+def test_save_and_load(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+
+    async def roundtrip():
+        await store.save("run-1", "abc", ["value"], {"display_text": "shown"})
+        return await store.completed("run-1"), await store.load("run-1", "abc")
+
+    completed, loaded = asyncio.run(roundtrip())
+    assert completed == {"abc"}
+    assert loaded == {"values": ["value"], "widgets": {"display_text": "shown"}}
+
+
+def test_resume_shows_output_widgets_again(tmp_path, catalog):
+    flow = {
+        "nodes": [
+            node("s", "String", catalog, {"string": "hello"}),
+            node("t", "ShowText", catalog),
+        ],
+        "edges": [edge("s", "string", "t", "text")],
+    }
+
+    async def run(resume):
+        graph = ReactflowGraph({}, catalog, FakeWebSocket())
+        graph.checkpoints = CheckpointStore(str(tmp_path))
+        await graph.update_from_json(flow)
+        await graph.execute_nodes(run_id="run-1", resume=resume)
+        return graph
+
+    asyncio.run(run(False))
+    resumed = asyncio.run(run(True))
+    assert resumed.last_run_stats["resumed_nodes"] == ["s", "t"]
+    assert ("t", {"name": "display_text", "value": "hello"}) in (
+        resumed.websocket.node_messages("widget_update")
+    )
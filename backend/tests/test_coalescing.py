@@ -0,0 +1,51 @@
+import asyncio
+
+from coalescing import FlowCoalescer
+
+
+def test_latest_submission_wins():
+    ran, superseded = [], []
+
+    async def run(message):
+        ran.append(message["n"])
+        await asyncio.sleep(0.05)
+
+    async def on_superseded(message):
+        superseded.append(message["n"])
+
+    async def main():
+        coalescer = FlowCoalescer(run, on_superseded, debounce=0.01)
+        for n in range(3):
+            await coalescer.submit({"n": n})
+        await asyncio.sleep(0.03)  # 2 is running
+        for n in range(3, 6):
+            await coalescer.submit({"n": n})
+        await coalescer.idle()
+        return coalescer.stats()
+
+    stats = asyncio.run(main())
+    assert ran == [2, 5]
+    assert superseded == [0, 1, 3, 4]
+    assert stats == {"submitted": 6, "superseded": 4, "failed": 0, "pending": False}
+
+
+def test_failed_run_does_not_stop_the_next():
+    ran = []
+
+    async def run(message):
+        ran.append(message["n"])
+        await asyncio.sleep(0.02)
+        if message["n"] == 0:
+            raise RuntimeError("flow failed")
+
+    async def main():
+        coalescer = FlowCoalescer(run, debounce=0)
+        await coalescer.submit({"n": 0})
+        await asyncio.sleep(0.01)
+        await coalescer.submit({"n": 1})  # Waits for the failing run
+        await coalescer.idle()
+        return coalescer.stats()
+
+    stats = asyncio.run(main())
+    assert ran == [0, 1]
+    assert stats["failed"] == 1
@@ -0,0 +1,60 @@
+import asyncio
+import copy
+
+from flow_api import GraphPool, apply_overrides, flow_key
+from flows import FakeWebSocket, edge, node
+from react_flowgraph import ReactflowGraph
+
+
+def reverse_flow(catalog):
+    return {
+        "nodes": [
+            node("s", "String", catalog, {"string": "abc"}),
+            node("r", "ReverseText", catalog),
+            node("t", "ShowText", catalog),
+        ],
+        "edges": [edge("s", "string", "r", "text"), edge("r", "reversed_text", "t", "text")],
+    }
+
+
+def test_flow_key_ignores_widget_values_and_layout(catalog):
+    flow = reverse_flow(catalog)
+    changed = copy.deepcopy(flow)
+    changed["nodes"].reverse()
+    changed["nodes"][0]["position"] = {"x": 10, "y": 20}
+    apply_overrides(changed, {"s": {"string": "xyz"}})
+    assert flow_key(changed) == flow_key(flow)
+
+    rewired = copy.deepcopy(flow)
+    rewired["edges"] = [edge("s", "string", "t", "text")]
+    assert flow_key(rewired) != flow_key(flow)
+
+
+def test_apply_overrides_by_id_or_label(catalog):
+    flow = reverse_flow(catalog)
+    apply_overrides(flow, {"s": {"string": "by id"}, "ShowText": {"display_text": "x"}})
+    values = {n["id"]: n["data"]["widgetValues"] for n in flow["nodes"]}
+    assert values["s"] == {"string": "by id"}
+    assert values["t"]["display_text"] == "x"
+
+
+def test_pool_reuses_warm_graph_for_the_same_structure(catalog):
+    created = []
+
+    def factory():
+        graph = ReactflowGraph({}, catalog, FakeWebSocket())
+        created.append(graph)
+        return graph
+
+    async def main():
+        pool = GraphPool(factory)
+        first = await pool.execute(reverse_flow(catalog), ["r"])
+        flow = apply_overrides(reverse_flow(catalog), {"s": {"string": "xyz"}})
+        second = await pool.execute(flow, ["r.reversed_text"])
+        return pool, first, second
+
+    pool, first, second = asyncio.run(main())
+    assert first == {"r": {"reversed_text": "cba"}}
+    assert second == {"r": {"reversed_text": "zyx"}}
+    assert len(created) == 1
+    assert pool.stats() == {"waiting": 0, "idle_graphs": 1, "flows": 1}
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from history import HistoryStore, find_regressions, recent_runs
+
+
+def node_run(class_name, started, duration, status="success", cache_hit=False):
+    return {
+        "node_id": class_name.lower(),
+        "class": class_name,
+        "started": started,
+        "duration": duration,
+        "status": status,
+        "cache_hit": cache_hit,
+    }
+
+
+def test_find_regressions(tmp_path):
+    path = str(tmp_path / "history.db")
+    now = time.time()
+    week_ago = now - 7 * 24 * 3600
+    nodes = (
+        [node_run("Slower", week_ago + i, 0.1) for i in range(5)]
+        + [node_run("Slower", now - i, 0.3) for i in range(5)]
+        + [node_run("Steady", week_ago + i, 0.1) for i in range(5)]
+        + [node_run("Steady", now - i, 0.11) for i in range(5)]
+        # Failures and cache hits are not timings of real work
+        + [node_run("Cached", week_ago + i, 0.1) for i in range(5)]
+        + [node_run("Cached", now - i, 0.5, cache_hit=True) for i in range(5)]
+        + [node_run("Failing", week_ago + i, 0.1) for i in range(5)]
+        + [node_run("Failing", now - i, 0.5, status="error") for i in range(5)]
+    )
+    run = {
+        "run_id": None,
+        "session_id": None,
+        "flow": None,
+        "kind": "flow",
+        "started": now,
+        "duration": 1.0,
+        "status": "success",
+        "nodes": nodes,
+    }
+    HistoryStore(path).write_batch([run])
+
+    regressions = find_regressions(path, threshold=1.5)
+    assert [r["class"] for r in regressions] == ["Slower"]
+    assert regressions[0]["ratio"] == 3.0
+    assert find_regressions(path, threshold=1.5, min_samples=6) == []
+    assert find_regressions(str(tmp_path / "missing.db")) == []
+
+
+def test_close_keeps_the_batch_being_written(tmp_path):
+    path = str(tmp_path / "history.db")
+    store = HistoryStore(path, flush_interval=0.01)
+    write_batch = store.write_batch
+
+    def slow_write_batch(batch, prune=False):
+        time.sleep(0.2)
+        write_batch(batch, prune)
+
+    store.write_batch = slow_write_batch
+
+    async def main():
+        store.record("flow", [node_run("Foo", time.time(), 0.1)], time.time(), 0.1, "success")
+        await asyncio.sleep(0.05)  # The writer task has taken the run from pending
+        assert not store.pending
+        store.record("flow", [], time.time(), 0.1, "success")
+        await store.close()
+
+    asyncio.run(main())
+    assert store.stats()["written"] == 2
+    assert store.stats()["dropped"] == 0
+    assert len(recent_runs(path)) == 2
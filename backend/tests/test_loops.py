@@ -0,0 +1,69 @@
+import asyncio
+
+from flows import FakeWebSocket, edge, loop_with_outside_input, node
+from react_flowgraph import ReactflowGraph
+
+
+async def build(flow, catalog):
+    graph = ReactflowGraph({}, catalog, FakeWebSocket())
+    graph.progress_interval = 0
+    await graph.update_from_json(flow)
+    await graph.warmed(graph.nodes)
+    return graph
+
+
+def test_loop_runs_after_every_outside_input(catalog):
+    async def main():
+        graph = await build(loop_with_outside_input(catalog), catalog)
+        return graph, [n.id for n in graph.get_execution_order()], await graph.execute_nodes()
+
+    graph, order, results = asyncio.run(main())
+    assert order.index("a2") < order.index("L")
+    assert order.index("L") + 1 == order.index("B")  # The body follows its loop node
+    assert all(outcome["status"] == "success" for outcome in graph.last_outcomes.values())
+    iterations = [data["iteration"] for _, data in graph.websocket.node_messages("iteration")]
+    assert iterations == [1, 2, 3]
+    # Results pinned for the passes are released, only the sink is returned
+    assert set(results) == {"st"}
+
+
+def test_retained_loop_input_stays_pinned(catalog):
+    async def main():
+        graph = await build(loop_with_outside_input(catalog), catalog)
+        return await graph.execute_nodes(retain=["a2"])
+
+    assert asyncio.run(main()) == {"a2": ["yx"], "st": [""]}
+
+
+def test_failed_loop_body_skips_only_its_descendants(catalog):
+    flow = {
+        "nodes": [
+            node("s", "String", catalog, {"string": "ab"}),
+            node("L", "Repeat", catalog, {"iterations": 2}),
+            node("d", "Delay", catalog, {"delay_ms": "not a number"}),
+            node("after", "ShowText", catalog),
+            node("other", "ShowText", catalog),
+        ],
+        "edges": [
+            edge("s", "string", "L", "initial"),
+            edge("L", "value", "d", "text"),
+            edge("d", "delayed_text", "L", "feedback"),
+            edge("L", "value", "after", "text"),
+            edge("s", "string", "other", "text"),
+        ],
+    }
+
+    async def main():
+        graph = await build(flow, catalog)
+        return graph, await graph.execute_nodes()
+
+    graph, results = asyncio.run(main())
+    statuses = {node_id: outcome["status"] for node_id, outcome in graph.last_outcomes.items()}
+    assert statuses == {
+        "s": "success",
+        "L": "failed",
+        "d": "skipped",
+        "after": "skipped",
+        "other": "success",
+    }
+    assert set(results) == {"other"}
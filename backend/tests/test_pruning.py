@@ -0,0 +1,57 @@
+import asyncio
+
+from flows import FakeWebSocket, edge, loop_with_outside_input, node
+from react_flowgraph import ReactflowGraph
+
+
+def two_branches(catalog):
+    """s feeds a ShowText, the unconnected branch u -> ur feeds nothing"""
+    return {
+        "nodes": [
+            node("s", "String", catalog, {"string": "abc"}),
+            node("r", "ReverseText", catalog),
+            node("t", "ShowText", catalog),
+            node("u", "String", catalog, {"string": "xyz"}),
+            node("ur", "ReverseText", catalog),
+        ],
+        "edges": [
+            edge("s", "string", "r", "text"),
+            edge("r", "reversed_text", "t", "text"),
+            edge("u", "string", "ur", "text"),
+        ],
+    }
+
+
+async def run(flow, catalog, **kwargs):
+    graph = ReactflowGraph({}, catalog, FakeWebSocket())
+    await graph.update_from_json(flow)
+    results = await graph.execute_nodes(**kwargs)
+    pruned = [
+        m["data"]["pruned"] for m in graph.websocket.sent if m["type"] == "nodes_pruned"
+    ]
+    return graph, results, pruned
+
+
+def test_lazy_run_prunes_branches_without_output_nodes(catalog):
+    graph, results, pruned = asyncio.run(run(two_branches(catalog), catalog, lazy=True))
+    assert set(graph.last_outcomes) == {"s", "r", "t"}
+    assert sorted(pruned[0]) == ["u", "ur"]
+    assert set(results) == {"t"}
+
+
+def test_targets_run_only_their_upstream_nodes(catalog):
+    flow = two_branches(catalog)
+    graph, results, _ = asyncio.run(run(flow, catalog, targets=["ur.reversed_text"]))
+    assert set(graph.last_outcomes) == {"u", "ur"}
+    assert results["ur"] == ["zyx"]
+
+
+def test_required_nodes_follows_loop_feedback(catalog):
+    async def main():
+        graph = ReactflowGraph({}, catalog, FakeWebSocket())
+        await graph.update_from_json(loop_with_outside_input(catalog))
+        return graph.required_nodes(["L"]), graph.required_nodes(["a2"])
+
+    through_loop, outside = asyncio.run(main())
+    assert through_loop == {"s", "a", "a2", "L", "B"}
+    assert outside == {"a", "a2"}
@@ -0,0 +1,44 @@
+import asyncio
+import base64
+import os
+
+from classes import CaptionedVideo
+from flows import FakeWebSocket, node
+from react_flowgraph import ReactflowGraph
+
+UPLOAD = "data:video/x-yuv4mpeg;base64," + base64.b64encode(b"YUV4MPEG2 W2 H2\n").decode()
+
+
+async def open_upload(graph, tmp_path):
+    await graph.warmed(graph.nodes)
+    instance = graph.nodes[0].python_class
+    instance.output_dir = str(tmp_path)
+    instance.widgets = [0, 0]  # Width and height, set by the graph when it runs
+    stream = await instance.run(CaptionedVideo(UPLOAD, "clip"))
+    assert os.path.exists(stream.path)
+    return instance, stream.path
+
+
+def test_removed_node_deletes_decoded_upload(catalog, tmp_path):
+    async def main():
+        graph = ReactflowGraph({}, catalog, FakeWebSocket(), validation_mode="warn")
+        await graph.update_from_json({"nodes": [node("v", "OpenVideo", catalog)], "edges": []})
+        _, path = await open_upload(graph, tmp_path)
+        await graph.update_from_json({"nodes": [], "edges": []})
+        return path
+
+    assert not os.path.exists(asyncio.run(main()))
+
+
+def test_new_upload_replaces_previous_file(catalog, tmp_path):
+    async def main():
+        graph = ReactflowGraph({}, catalog, FakeWebSocket(), validation_mode="warn")
+        await graph.update_from_json({"nodes": [node("v", "OpenVideo", catalog)], "edges": []})
+        instance, first = await open_upload(graph, tmp_path)
+        second = (await instance.run(CaptionedVideo(UPLOAD + "AA", "clip"))).path
+        graph.close()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert not os.path.exists(first)
+    assert not os.path.exists(second)
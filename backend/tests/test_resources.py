@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from resources import MEMORY, ResourcePools
+
+
+def test_waiting_node_holds_none_of_its_slots():
+    events = []
+
+    async def use(pools, name, resources, hold):
+        async with pools.acquire(resources):
+            events.append(name)
+            await hold.wait()
+
+    async def main():
+        pools = ResourcePools({"gpu": 1, "cpu": 2})
+        gpu_free, done = asyncio.Event(), asyncio.Event()
+        done.set()
+        first = asyncio.create_task(use(pools, "gpu", {"gpu": 1}, gpu_free))
+        await asyncio.sleep(0)
+        both = asyncio.create_task(use(pools, "both", {"gpu": 1, "cpu": 1}, done))
+        await asyncio.sleep(0)
+        assert pools.in_use == {"gpu": 1, "cpu": 0}  # both waits for the gpu only
+        await use(pools, "cpus", {"cpu": 2}, done)
+        gpu_free.set()
+        await asyncio.gather(first, both)
+        return pools
+
+    pools = asyncio.run(main())
+    assert events == ["gpu", "cpus", "both"]
+    assert pools.in_use == {"gpu": 0, "cpu": 0}
+    assert pools.stats()["waits"] == 1
+
+
+def test_requirements():
+    pools = ResourcePools({"cpu": 4, MEMORY: 1000})
+    # Resources without a pool are unlimited
+    assert pools.requirements({"ollama": 1, "cpu": 2}, memory=100) == {"cpu": 2, MEMORY: 100}
+    with pytest.raises(ValueError):
+        pools.requirements({"cpu": 5})  # Could never be granted
@@ -0,0 +1,60 @@
+import asyncio
+import os
+
+from result_store import ResultStore
+
+
+def test_outputs_released_after_last_read():
+    async def main():
+        store = ResultStore()
+        await store.put("a", ["x" * 10, "y" * 5], reads=2)
+        await store.put("b", ["z"], reads=1)
+        assert store.memory_in_use == 16
+        store.consume("a")
+        assert "a" in store
+        store.consume("a")
+        assert "a" not in store
+        store.pinned.add("b")
+        store.consume("b")  # Pinned results outlive their reads
+        assert "b" in store
+        return store
+
+    store = asyncio.run(main())
+    assert store.memory_in_use == 1
+    assert store.stats()["released_nodes"] == 1
+
+
+def test_spills_largest_value_and_loads_it_back(tmp_path):
+    async def main():
+        store = ResultStore(memory_budget=150, spill_threshold=50, spill_dir=str(tmp_path))
+        await store.put("small", ["s" * 40], reads=1)
+        await store.put("large", ["l" * 100], reads=1)
+        await store.put("medium", ["m" * 60], reads=1)
+        assert list(store.spilled) == [("large", 0)]
+        assert store.memory_in_use == 100
+        assert await store.get("large") == ["l" * 100]
+        path = store.spilled[("large", 0)]
+        store.consume("large")
+        return path
+
+    path = asyncio.run(main())
+    assert not os.path.exists(path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_spills_least_recently_used_values_below_threshold(tmp_path):
+    async def main():
+        store = ResultStore(memory_budget=100, spill_threshold=1000, spill_dir=str(tmp_path))
+        await store.put("a", ["a" * 40], reads=1)
+        await store.put("b", ["b" * 40], reads=1)
+        await store.get("a")  # b is now the least recently used
+        await store.put("c", ["c" * 40], reads=1)
+        assert list(store.spilled) == [("b", 0)]
+        assert store.memory_in_use == 80
+        assert await store.get("b") == ["b" * 40]
+        store.close()
+        return store
+
+    store = asyncio.run(main())
+    assert store.memory_in_use == 0
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+from classes import Node
+from react_flowgraph import ReactflowGraph
+from resources import ResourcePools
+from scheduler import Scheduler
+
+
+class Flaky(Node):
+    retries = 2
+    retry_backoff = 0.05
+    resources = {"gpu": 1}
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+        self.failures = 2
+
+    async def run(self, text: str) -> str:
+        self.events.append("flaky attempt")
+        if self.failures:
+            self.failures -= 1
+            raise OSError("busy")
+        return text
+
+
+class Quick(Node):
+    resources = {"gpu": 1}
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+
+    async def run(self, text: str) -> str:
+        self.events.append("quick")
+        return text
+
+
+def graph_node(instance):
+    return SimpleNamespace(
+        python_class=instance, label=type(instance).__name__, cache_hit=False
+    )
+
+
+def test_backoff_holds_no_resource_or_scheduler_slot(catalog):
+    events = []
+
+    async def main():
+        graph = ReactflowGraph({}, catalog, scheduler=Scheduler(max_concurrent=1))
+        graph.resources = ResourcePools({"gpu": 1})
+        flaky = asyncio.create_task(
+            graph.run_node_instance(graph_node(Flaky(events)), {"text": "a"})
+        )
+        await asyncio.sleep(0.01)  # Flaky failed once and is backing off
+        quick = await graph.run_node_instance(graph_node(Quick(events)), {"text": "b"})
+        return await flaky, quick
+
+    assert asyncio.run(main()) == (["a"], ["b"])
+    # Quick got the gpu and the only scheduler slot during Flaky's backoff
+    assert events == ["flaky attempt", "quick", "flaky attempt", "flaky attempt"]
@@ -0,0 +1,62 @@
+import asyncio
+
+from scheduler import FLOW, INTERACTIVE, Scheduler
+
+
+def test_running_never_exceeds_the_cap():
+    peak = 0
+
+    async def job(scheduler):
+        nonlocal peak
+        async with scheduler.slot("a"):
+            peak = max(peak, scheduler.running)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        scheduler = Scheduler(max_concurrent=3)
+        await asyncio.gather(*(job(scheduler) for _ in range(10)))
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert peak == 3
+    assert scheduler.running == 0
+    assert scheduler.stats()["started"] == 10
+
+
+def test_connections_take_turns_and_interactive_goes_first():
+    order = []
+
+    async def job(scheduler, connection_id, name, priority=FLOW):
+        async with scheduler.slot(connection_id, priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def main():
+        scheduler = Scheduler(max_concurrent=1)
+        await scheduler.acquire("a")  # Everything below has to queue
+        jobs = [job(scheduler, "a", f"a{i}") for i in range(4)]
+        jobs += [job(scheduler, "b", f"b{i}") for i in range(2)]
+        jobs.append(job(scheduler, "c", "c0", INTERACTIVE))
+        tasks = [asyncio.create_task(j) for j in jobs]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == 7
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["c0", "a0", "b0", "a1", "b1", "a2", "a3"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = Scheduler(max_concurrent=1)
+        await scheduler.acquire("a")
+        waiting = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert scheduler.queue_depth() == 0
+        scheduler.release()
+        return scheduler.running
+
+    assert asyncio.run(main()) == 0
@@ -0,0 +1,41 @@
+import asyncio
+
+from flows import FakeWebSocket, edge, node
+from react_flowgraph import ReactflowGraph
+from singleflight import SingleFlight
+
+
+def test_only_pure_nodes_share_a_run(catalog):
+    flow = {
+        "nodes": [
+            node("s", "String", catalog, {"string": "hi"}),
+            node("d", "Delay", catalog, {"delay_ms": 100}),
+            node("t", "ShowText", catalog),
+        ],
+        "edges": [
+            edge("s", "string", "d", "text"),
+            edge("d", "delayed_text", "t", "text"),
+        ],
+    }
+    single_flight = SingleFlight()
+
+    async def run(session):
+        graph = ReactflowGraph(
+            {}, catalog, FakeWebSocket(), single_flight=single_flight, connection_id=session
+        )
+        await graph.update_from_json(flow)
+        await graph.warmed(graph.nodes)
+        await graph.execute_nodes()
+        return graph
+
+    async def main():
+        return await asyncio.gather(run("a"), run("b"))
+
+    graphs = asyncio.run(main())
+    # The second Delay joined the first; ShowText never goes through single-flight
+    assert single_flight.followers == 1
+    assert single_flight.leaders == 3  # Both Strings, finished before the other started
+    for graph in graphs:
+        assert ("t", {"name": "display_text", "value": "hi"}) in (
+            graph.websocket.node_messages("widget_update")
+        )
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from flows import FakeWebSocket, edge, node
+from react_flowgraph import ReactflowGraph
+from shm_transport import SharedMemoryTransport
+from worker_pool import WorkerPool
+
+
+@pytest.fixture
+def worker_address(tmp_path):
+    path = str(tmp_path / "worker.sock")
+    process = subprocess.Popen(
+        [sys.executable, "worker.py", "--unix", path, "--classes", "ReverseText"],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        assert process.poll() is None, "worker exited"
+        assert time.monotonic() < deadline, "worker did not start"
+        time.sleep(0.05)
+    yield f"unix://{path}"
+    process.terminate()
+    process.wait()
+
+
+def segments(prefix):
+    return [name for name in os.listdir("/dev/shm") if name.startswith(prefix)]
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs /dev/shm")
+def test_worker_round_trip_unlinks_shared_memory(catalog, worker_address):
+    text = "abcdefgh" * 1024
+    flow = {
+        "nodes": [
+            node("s", "String", catalog, {"string": text}),
+            node("r", "ReverseText", catalog),
+            node("r2", "ReverseText", catalog),
+            node("t", "ShowText", catalog),
+        ],
+        "edges": [
+            edge("s", "string", "r", "text"),
+            edge("r", "reversed_text", "r2", "text"),
+            edge("r2", "reversed_text", "t", "text"),
+        ],
+    }
+
+    async def main():
+        transport = SharedMemoryTransport(threshold=1024)
+        pool = WorkerPool([worker_address], transport=transport)
+        await pool.start()
+        try:
+            graph = ReactflowGraph({}, catalog, FakeWebSocket(), worker_pool=pool)
+            await graph.update_from_json(flow)
+            results = await graph.execute_nodes(retain=["r"])
+            return transport, results, graph.websocket.node_messages("widget_update")
+        finally:
+            await pool.stop()
+
+    transport, results, shown = asyncio.run(main())
+    # r ran in the worker and handed r2 its output as a segment, t ran here
+    assert results["r"] == [text[::-1]]
+    assert shown == [("t", {"name": "display_text", "value": text})]
+    assert transport.stats()["created"] >= 2
+    assert transport.stats()["segments"] == 0
+    assert segments(transport.prefix) == []
@@ -0,0 +1,187 @@
+from typing import Dict, FrozenSet, List, Optional
+
+# Type strings produced by noderizer that accept or provide anything
+ANY_TYPES = {"typing.Any", "<class '_empty'>"}
+
+
+class FlowValidationError(ValueError):
+    """Raised when a flow has problems that must be fixed before it can run"""
+
+    def __init__(self, problems: List[Dict]):
+        self.problems = problems
+        super().__init__(
+            f"Flow has {len(problems)} problem(s):\n"
+            + "\n".join(f"- {problem['message']}" for problem in problems)
+        )
+
+
+def split_type_args(type_str: str) -> List[str]:
+    """Splits the top level arguments of e.g. 'typing.Union[str, typing.List[str]]'"""
+    inner = type_str[type_str.index("[") + 1 : type_str.rindex("]")]
+    args, depth, current = [], 0, ""
+    for char in inner:
+        if char == "," and depth == 0:
+            args.append(current.strip())
+            current = ""
+            continue
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        current += char
+    if current.strip():
+        args.append(current.strip())
+    return args
+
+
+def normalize_type(type_str: str) -> str:
+    """Brings a bare type name ('str', 'classes.CaptionedImage') to noderizer's format"""
+    type_str = type_str.strip()
+    if type_str.startswith(("<class ", "typing.")) or type_str == "None":
+        return type_str
+    if "[" in type_str:
+        return type_str
+    return f"<class '{type_str.split('.')[-1]}'>"
+
+
+def type_members(type_str: str) -> List[str]:
+    if type_str.startswith(("typing.Union[", "typing.Optional[")):
+        return [normalize_type(arg) for arg in split_type_args(type_str)]
+    return [normalize_type(type_str)]
+
+
+def list_element_type(type_str: str) -> Optional[str]:
+    if type_str.startswith(("typing.List[", "list[")):
+        return normalize_type(split_type_args(type_str)[0])
+    return None
+
+
+def types_compatible(output_type: str, input_type: str) -> bool:
+    if output_type in ANY_TYPES or input_type in ANY_TYPES:
+        return True
+    input_members = set(type_members(input_type))
+    for member in type_members(output_type):
+        # A List output can also feed its element type through map mode
+        candidates = {member, list_element_type(member)}
+        if candidates & input_members:
+            return True
+    return False
+
+
+def build_compatibility_table(python_classes) -> Dict[str, FrozenSet[str]]:
+    """
+    Maps every input type string in the catalog to the set of catalog output
+    type strings that may be connected to it.
+    """
+    input_types = {
+        inp["type"] for cls in python_classes for inp in cls.get("inputs", [])
+    }
+    output_types = {
+        out["type"] for cls in python_classes for out in cls.get("outputs", [])
+    }
+    return {
+        input_type: frozenset(
+            output_type
+            for output_type in output_types
+            if types_compatible(output_type, input_type)
+        )
+        for input_type in input_types
+    }
+
+
+def validate_flow(
+    nodes, edges: List[Dict], python_classes, table, required: Optional[set] = None
+) -> List[Dict]:
+    """
+    Checks every edge and required input of a flow against the catalog metadata.
+    With required, only those node ids must have their required inputs
+    connected, the rest are pruned from the run anyway.
+    Returns all problems found, each as {"message", "node_id", "edge_id", "edge_index"}.
+    """
+    catalog = {cls["name"]: cls for cls in python_classes}
+    nodes_by_id = {node.id: node for node in nodes}
+    problems = []
+
+    def problem(message, node_id=None, edge_index=None):
+        problems.append(
+            {
+                "message": message,
+                "node_id": node_id,
+                "edge_id": edges[edge_index].get("id") if edge_index is not None else None,
+                "edge_index": edge_index,
+            }
+        )
+
+    for node in nodes:
+        if node.label not in catalog:
+            problem(f"{node.label or node.id} is not a known node class", node.id)
+
+    connected_inputs = {}
+    for edge_index, edge in enumerate(edges):
+        source = nodes_by_id.get(edge.get("source"))
+        target = nodes_by_id.get(edge.get("target"))
+        if not source or not target:
+            problem(
+                f"Edge {edge.get('source')} -> {edge.get('target')} references a missing node",
+                edge_index=edge_index,
+            )
+            continue
+        if source.label not in catalog or target.label not in catalog:
+            continue
+
+        source_handle = edge.get("sourceHandle")
+        target_handle = edge.get("targetHandle")
+        output = next(
+            (
+                out
+                for out in catalog[source.label]["outputs"]
+                if out["name"] == source_handle
+            ),
+            None,
+        )
+        target_input = next(
+            (
+                inp
+                for inp in catalog[target.label]["inputs"]
+                if inp["name"] == target_handle
+            ),
+            None,
+        )
+        if output is None:
+            problem(f"{source.label} has no output '{source_handle}'", source.id, edge_index)
+            continue
+        if target_input is None:
+            problem(f"{target.label} has no input '{target_handle}'", target.id, edge_index)
+            continue
+
+        compatible = table.get(target_input["type"])
+        if compatible is None:
+            valid = types_compatible(output["type"], target_input["type"])
+        else:
+            valid = output["type"] in compatible
+        if not valid:
+            problem(
+                f"{source.label}.{source_handle} ({output['type']}) cannot connect to "
+                f"{target.label}.{target_handle} ({target_input['type']})",
+                target.id,
+                edge_index,
+            )
+            continue
+
+        key = (target.id, target_handle)
+        connected_inputs[key] = connected_inputs.get(key, 0) + 1
+        if connected_inputs[key] == 2 and not target_input.get("accepts_multiple"):
+            problem(
+                f"{target.label}.{target_handle} accepts only one connection",
+                target.id,
+                edge_index,
+            )
+
+    for node in nodes:
+        if required is not None and node.id not in required:
+            continue
+        for inp in catalog.get(node.label, {}).get("inputs", []):
+            if inp.get("required", True) and (node.id, inp["name"]) not in connected_inputs:
+                problem(f"{node.label} is missing required input '{inp['name']}'", node.id)
+
+    return problems
@@ -0,0 +1,299 @@
+"""
+Frame streaming for video nodes.
+
+Sources read frames lazily from a file: YUV4MPEG2 (.y4m) and raw RGB/gray
+files are memory-mapped, anything Pillow can open as an image sequence
+(GIF, animated WebP/PNG, multi-page TIFF) is decoded one frame at a time.
+Only Pillow is needed, so everything works offline.
+"""
+
+import asyncio
+import base64
+import mimetypes
+import mmap
+import os
+import tempfile
+import threading
+import time
+from io import BytesIO
+from typing import Callable, Dict, Iterator, List, Optional
+
+from PIL import Image, ImageFilter, ImageOps, ImageSequence
+
+RAW_EXTENSIONS = (".rgb", ".raw", ".gray")
+# 8-bit Y4M chroma tags, by the subsampling they mean
+Y4M_CHROMA = {
+    "420": "420",
+    "420jpeg": "420",
+    "420paldv": "420",
+    "420mpeg2": "420",
+    "444": "444",
+    "mono": "mono",
+}
+
+
+class Y4MSource:
+    """Memory-mapped YUV4MPEG2 file (420, 444 or mono chroma)"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = self.map.find(b"\n")
+        params = self.map[:header_end].decode().split()
+        if params[0] != "YUV4MPEG2":
+            raise ValueError(f"{path} is not a YUV4MPEG2 file")
+        self.chroma = "420"
+        self.fps = 25.0
+        for param in params[1:]:
+            if param[0] == "W":
+                self.width = int(param[1:])
+            elif param[0] == "H":
+                self.height = int(param[1:])
+            elif param[0] == "F":
+                num, den = param[1:].split(":")
+                self.fps = int(num) / int(den)
+            elif param[0] == "C":
+                if param[1:] not in Y4M_CHROMA:
+                    # e.g. 422, 411 or high bit depth like 420p10, which would decode as noise
+                    raise ValueError(f"{path} has unsupported Y4M chroma {param[1:]}")
+                self.chroma = Y4M_CHROMA[param[1:]]
+        self.offset = header_end + 1
+
+    def frames(self) -> Iterator[Image.Image]:
+        w, h = self.width, self.height
+        chroma_size = {"420": (w + 1) // 2 * ((h + 1) // 2), "444": w * h, "mono": 0}[
+            self.chroma
+        ]
+        offset = self.offset
+        while offset < len(self.map):
+            offset = self.map.find(b"\n", offset) + 1  # Skip "FRAME[ params]"
+            y = Image.frombuffer("L", (w, h), self.map[offset : offset + w * h])
+            offset += w * h
+            if self.chroma == "mono":
+                yield y.convert("RGB")
+                continue
+            chroma_dims = (w, h) if self.chroma == "444" else ((w + 1) // 2, (h + 1) // 2)
+            planes = []
+            for _ in range(2):
+                plane = Image.frombuffer(
+                    "L", chroma_dims, self.map[offset : offset + chroma_size]
+                )
+                planes.append(plane.resize((w, h)) if self.chroma == "420" else plane)
+                offset += chroma_size
+            yield Image.merge("YCbCr", (y, *planes)).convert("RGB")
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class RawSource:
+    """Memory-mapped headerless frames of a known size (rgb24, or gray for .gray)"""
+
+    def __init__(self, path: str, width: int, height: int, fps: float = 25.0):
+        if not width or not height:
+            raise ValueError("Raw video needs a width and height")
+        self.width, self.height, self.fps = width, height, fps
+        self.mode = "L" if path.endswith(".gray") else "RGB"
+        self.frame_size = width * height * (1 if self.mode == "L" else 3)
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def frames(self) -> Iterator[Image.Image]:
+        for offset in range(0, len(self.map) - self.frame_size + 1, self.frame_size):
+            frame = Image.frombuffer(
+                self.mode,
+                (self.width, self.height),
+                self.map[offset : offset + self.frame_size],
+            )
+            yield frame.convert("RGB")
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class PillowSource:
+    """Animated image formats, decoded one frame at a time"""
+
+    def __init__(self, path: str):
+        self.image = Image.open(path)
+        self.width, self.height = self.image.size
+        duration = self.image.info.get("duration") or 40
+        self.fps = 1000.0 / duration
+
+    def frames(self) -> Iterator[Image.Image]:
+        for frame in ImageSequence.Iterator(self.image):
+            yield frame.convert("RGB")
+
+    def close(self):
+        self.image.close()
+
+
+def open_video(path: str, width: int = 0, height: int = 0):
+    if path.endswith(".y4m"):
+        return Y4MSource(path)
+    if path.endswith(RAW_EXTENSIONS):
+        return RawSource(path, width, height)
+    return PillowSource(path)
+
+
+def materialize_video(video: str, directory: str) -> str:
+    """
+    Returns a file path for an uploaded video. Data URLs from the upload
+    widget are decoded to a file once so frames can be read lazily from disk.
+    """
+    if not video.startswith("data:"):
+        return video
+    header, data = video.split(",", 1)
+    mime = header[len("data:") :].split(";")[0]
+    extension = {"video/x-yuv4mpeg": ".y4m", "video/yuv4mpeg": ".y4m"}.get(
+        mime, mimetypes.guess_extension(mime) or ".bin"
+    )
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=extension, dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        f.write(base64.b64decode(data))
+    return path
+
+
+def discard_video(video: str, path: str):
+    """Deletes the file materialize_video decoded an uploaded video to"""
+    if video.startswith("data:"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Per-frame operations, referenced by name so a VideoStream stays picklable
+FRAME_OPS: Dict[str, Callable[[Image.Image], Image.Image]] = {
+    "grayscale": lambda frame: ImageOps.grayscale(frame).convert("RGB"),
+    "invert": ImageOps.invert,
+    "mirror": ImageOps.mirror,
+    "flip": ImageOps.flip,
+    "blur": lambda frame: frame.filter(ImageFilter.GaussianBlur(2)),
+    "edges": lambda frame: frame.filter(ImageFilter.FIND_EDGES),
+}
+
+
+def apply_ops(frame: Image.Image, ops: List[str]) -> Image.Image:
+    for op in ops:
+        frame = FRAME_OPS[op](frame)
+    return frame
+
+
+async def stream_frames(
+    source, ops: List[str], max_buffered: int = 8
+):
+    """
+    Yields processed frames from a reader thread. At most max_buffered frames
+    wait in the queue, so a slow consumer stops the reader instead of the
+    whole video piling up in memory.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(max_buffered)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for frame in source.frames():
+                if stop.is_set():
+                    return
+                item = apply_ops(frame, ops)
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        except Exception as e:
+            asyncio.run_coroutine_threadsafe(queue.put(e), loop).result()
+        finally:
+            if not stop.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+
+    reader = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()  # Unblock a reader waiting on a full queue
+        await reader
+
+
+class Y4MWriter:
+    """
+    Writes frames incrementally as 4:4:4 YUV4MPEG2, readable by Y4MSource and
+    ffmpeg. Frames go to a .part file that is renamed into place on close.
+    """
+
+    def __init__(self, path: str, width: int, height: int, fps: float):
+        self.path = path
+        self.file = open(path + ".part", "wb")
+        num, den = int(round(fps * 1000)), 1000
+        self.file.write(f"YUV4MPEG2 W{width} H{height} F{num}:{den} Ip A1:1 C444\n".encode())
+        self.size = (width, height)
+
+    def write(self, frame: Image.Image):
+        if frame.size != self.size:
+            frame = frame.resize(self.size)
+        self.file.write(b"FRAME\n")
+        for plane in frame.convert("YCbCr").split():
+            self.file.write(plane.tobytes())
+
+    def close(self, keep: bool = True):
+        self.file.close()
+        if keep:
+            os.replace(self.path + ".part", self.path)
+        else:
+            os.remove(self.path + ".part")
+
+
+def thumbnail_data_url(frame: Image.Image, size: int = 160) -> str:
+    thumb = frame.copy()
+    thumb.thumbnail((size, size))
+    buffered = BytesIO()
+    thumb.save(buffered, format="JPEG", quality=70)
+    return f"data:image/jpeg;base64,{base64.b64encode(buffered.getvalue()).decode()}"
+
+
+async def process_video(
+    path: str,
+    ops: List[str],
+    output_path: str,
+    on_preview=None,
+    preview_interval: float = 0.5,
+    width: int = 0,
+    height: int = 0,
+    max_buffered: int = 8,
+) -> int:
+    """
+    Streams a video through ops into output_path, calling on_preview with a
+    thumbnail data URL at most every preview_interval seconds. Returns the
+    number of frames written.
+    """
+    source = open_video(path, width, height)
+    writer = None
+    frame_count = 0
+    last_preview: Optional[float] = None
+    completed = False
+    try:
+        async for frame in stream_frames(source, ops, max_buffered):
+            if writer is None:
+                writer = Y4MWriter(output_path, *frame.size, source.fps)
+            await asyncio.to_thread(writer.write, frame)
+            frame_count += 1
+            now = time.monotonic()
+            if on_preview and (last_preview is None or now - last_preview >= preview_interval):
+                last_preview = now
+                await on_preview(await asyncio.to_thread(thumbnail_data_url, frame))
+        completed = True
+    finally:
+        if writer:
+            writer.close(keep=completed)
+        source.close()
+    return frame_count
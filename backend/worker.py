@@ -0,0 +1,157 @@
+"""
+Node worker process. Loads the noderizer catalog and executes node runs the
+server dispatches to it over TCP or a Unix socket.
+
+    python worker.py --port 9001
+    python worker.py --unix /tmp/noder_worker.sock --classes OllamaQuery
+
+Payloads are pickled, so only connect workers and servers that trust each other.
+"""
+
+import argparse
+import asyncio
+import os
+import traceback
+
+from noderizer import get_python_classes
+from shm_transport import export_value, resolve_value
+from worker_protocol import dump_payload, load_payload, read_frame, write_frame
+
+
+class WorkerSocket:
+    """Stands in for the client websocket inside the worker and forwards node
+    messages back to the server for the request being executed"""
+
+    def __init__(self, connection, request_id: str):
+        self.connection = connection
+        self.request_id = request_id
+
+    async def send_json(self, message):
+        node_message = message.get("data", {}).get("message", {})
+        await self.connection.send(
+            {
+                "type": "message",
+                "id": self.request_id,
+                "message_type": node_message.get("type"),
+                "data": node_message.get("data"),
+            }
+        )
+
+
+class WorkerConnection:
+    def __init__(self, worker, reader, writer):
+        self.worker = worker
+        self.reader = reader
+        self.writer = writer
+        self.write_lock = asyncio.Lock()
+
+    async def send(self, header, payload: bytes = b""):
+        async with self.write_lock:
+            await write_frame(self.writer, header, payload)
+
+    async def serve(self):
+        tasks = set()
+        try:
+            while True:
+                header, payload = await read_frame(self.reader)
+                if header["type"] == "hello":
+                    await self.send(
+                        {
+                            "type": "hello",
+                            "classes": sorted(self.worker.classes),
+                            "pid": os.getpid(),
+                        }
+                    )
+                elif header["type"] == "ping":
+                    await self.send({"type": "pong"})
+                elif header["type"] == "run":
+                    task = asyncio.create_task(self.run(header, payload))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif header["type"] == "release":
+                    self.worker.release(header["session"])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.writer.close()
+
+    async def run(self, header, payload):
+        request_id = header["id"]
+        try:
+            instance = self.worker.get_instance(
+                header["session"], header["node_id"], header["class_name"]
+            )
+            instance.node_id = header["node_id"]
+            instance.widgets = header["widgets"]
+            instance.websocket = WorkerSocket(self, request_id)
+            # "run_batch" for a whole mapped batch, which returns a list per element
+            run = instance._run_batch if header.get("function") == "run_batch" else instance._run
+            result = list(await run(**resolve_value(load_payload(payload))))
+            if header.get("shm_threshold"):
+                # Large outputs go back as handles, the server owns the segments
+                result = export_value(
+                    result, header["shm_threshold"], header["shm_prefix"]
+                )
+            await self.send({"type": "result", "id": request_id}, dump_payload(result))
+        except Exception as e:
+            traceback.print_exc()
+            await self.send({"type": "error", "id": request_id, "message": str(e)})
+
+
+class Worker:
+    def __init__(self, classes=None):
+        catalog = get_python_classes()
+        self.classes = {
+            entry["name"]: entry["class"]
+            for entry in catalog
+            if not classes or entry["name"] in classes
+        }
+        # (session, node_id) -> node instance, so stateful nodes stay warm
+        self.instances = {}
+
+    def get_instance(self, session, node_id, class_name):
+        key = (session, node_id)
+        instance = self.instances.get(key)
+        if instance is None or type(instance).__name__ != class_name:
+            if class_name not in self.classes:
+                raise ValueError(f"This worker does not serve {class_name}")
+            instance = self.classes[class_name]()
+            self.instances[key] = instance
+        return instance
+
+    def release(self, session):
+        for key in [key for key in self.instances if key[0] == session]:
+            self.instances.pop(key).release()
+
+    async def handle_connection(self, reader, writer):
+        await WorkerConnection(self, reader, writer).serve()
+
+    async def serve(self, host=None, port=None, unix_path=None):
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(
+                self.handle_connection, path=unix_path
+            )
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        for sock in server.sockets:
+            print(f"Worker serving {sorted(self.classes)} on {sock.getsockname()}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--unix", help="Serve on a Unix socket instead of TCP")
+    parser.add_argument(
+        "--classes", help="Comma separated node classes to serve (default: all)"
+    )
+    args = parser.parse_args()
+
+    classes = set(args.classes.split(",")) if args.classes else None
+    asyncio.run(Worker(classes).serve(args.host, args.port, args.unix))
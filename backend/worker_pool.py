@@ -0,0 +1,231 @@
+import asyncio
+import uuid
+from typing import Dict, List, Optional
+
+from shm_transport import resolve_value
+from worker_protocol import (
+    dump_payload,
+    load_payload,
+    open_connection,
+    parse_address,
+    read_frame,
+    write_frame,
+)
+
+
+class WorkerUnavailable(Exception):
+    """The worker went away or no worker serves the node class"""
+
+
+class RemoteNodeError(Exception):
+    """The node raised inside the worker"""
+
+
+class RemoteWorker:
+    """Server side of one connection to a worker process"""
+
+    def __init__(self, address: str, health_timeout: float = 2.0):
+        self.address = address
+        self.health_timeout = health_timeout
+        self.classes = set()
+        self.healthy = False
+        self.pid = None
+        self.reader = None
+        self.writer = None
+        self.reader_task = None
+        self.write_lock = asyncio.Lock()
+        self.pong = asyncio.Event()
+        self.pending: Dict[str, tuple] = {}  # request id -> (future, node instance)
+        kind, host, _ = parse_address(address)
+        # Same machine, so large values can travel as shared memory handles
+        self.local = kind == "unix" or host in ("127.0.0.1", "localhost", "::1")
+
+    async def connect(self):
+        reader, writer = await asyncio.wait_for(
+            open_connection(self.address), self.health_timeout
+        )
+        await write_frame(writer, {"type": "hello"})
+        header, _ = await asyncio.wait_for(read_frame(reader), self.health_timeout)
+        self.reader, self.writer = reader, writer
+        self.classes = set(header["classes"])
+        self.pid = header.get("pid")
+        self.healthy = True
+        self.reader_task = asyncio.create_task(self.read_loop())
+        print(f"Worker {self.address} connected, serving {sorted(self.classes)}")
+
+    async def send(self, header, payload: bytes = b""):
+        async with self.write_lock:
+            await write_frame(self.writer, header, payload)
+
+    async def read_loop(self):
+        try:
+            while True:
+                header, payload = await read_frame(self.reader)
+                request = self.pending.get(header.get("id"))
+                if header["type"] == "pong":
+                    self.pong.set()
+                elif request is None:
+                    continue
+                elif header["type"] == "result":
+                    request[0].set_result(load_payload(payload))
+                elif header["type"] == "error":
+                    request[0].set_exception(RemoteNodeError(header["message"]))
+                elif header["type"] == "message":
+                    # Relay through the local instance so listeners see it too
+                    await request[1].send_message(header["message_type"], header["data"])
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            self.mark_down()
+
+    def mark_down(self):
+        if self.healthy:
+            print(f"Worker {self.address} is down")
+        self.healthy = False
+        if self.writer:
+            self.writer.close()
+        for future, _ in self.pending.values():
+            if not future.done():
+                future.set_exception(WorkerUnavailable(f"Worker {self.address} went away"))
+
+    async def run(
+        self,
+        instance,
+        input_args: Dict,
+        session: Optional[str],
+        shared=None,
+        function: str = "run",
+    ):
+        if not self.healthy:
+            raise WorkerUnavailable(f"Worker {self.address} is down")
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = (future, instance)
+        header = {
+            "type": "run",
+            "id": request_id,
+            "session": session,
+            "node_id": instance.node_id,
+            "class_name": type(instance).__name__,
+            "widgets": instance.widgets,
+            "function": function,
+        }
+        if shared:
+            header.update(shm_threshold=shared.threshold, shm_prefix=shared.prefix)
+        try:
+            await self.send(header, dump_payload(input_args))
+            return await future
+        except (ConnectionError, OSError) as e:
+            self.mark_down()
+            raise WorkerUnavailable(str(e))
+        finally:
+            del self.pending[request_id]
+
+    async def check_health(self):
+        """Reconnects a down worker, pings a healthy one"""
+        if not self.healthy:
+            try:
+                await self.connect()
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass
+            return
+        self.pong.clear()
+        try:
+            await self.send({"type": "ping"})
+            await asyncio.wait_for(self.pong.wait(), self.health_timeout)
+        except (OSError, asyncio.TimeoutError):
+            self.mark_down()
+
+    async def close(self):
+        if self.reader_task:
+            self.reader_task.cancel()
+        self.mark_down()
+
+
+class WorkerPool:
+    """
+    Dispatches node runs to worker processes by node class. Each run goes to
+    the least busy healthy worker serving its class and fails over to the next
+    one if that worker goes away mid-run.
+    """
+
+    def __init__(
+        self, addresses: List[str], health_interval: float = 5.0, transport=None
+    ):
+        self.workers = [RemoteWorker(address) for address in addresses]
+        self.health_interval = health_interval
+        self.health_task = None
+        # SharedMemoryTransport used with workers on this machine
+        self.transport = transport
+
+    async def start(self):
+        await asyncio.gather(*(worker.check_health() for worker in self.workers))
+        self.health_task = asyncio.create_task(self.health_loop())
+
+    async def health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*(worker.check_health() for worker in self.workers))
+
+    def serves(self, class_name: str) -> bool:
+        return any(w.healthy and class_name in w.classes for w in self.workers)
+
+    async def run(
+        self,
+        instance,
+        input_args: Dict,
+        session: Optional[str] = None,
+        function: str = "run",
+    ):
+        class_name = type(instance).__name__
+        candidates = sorted(
+            (w for w in self.workers if w.healthy and class_name in w.classes),
+            key=lambda w: len(w.pending),
+        )
+        for worker in candidates:
+            shared = self.transport if worker.local else None
+            created = []
+            if shared:
+                args, created = shared.export(input_args)
+            elif self.transport:
+                args = resolve_value(input_args)  # Handles mean nothing to other machines
+            else:
+                args = input_args
+            try:
+                result = await worker.run(instance, args, session, shared, function)
+                if shared:
+                    shared.track(result)
+                return result
+            except WorkerUnavailable as e:
+                print(f"Failing over {class_name}: {e}")
+            finally:
+                if created:
+                    shared.discard(created)
+        raise WorkerUnavailable(f"No worker available for {class_name}")
+
+    async def release(self, session: str):
+        """Lets workers drop the node instances they keep for a session"""
+        for worker in self.workers:
+            if worker.healthy:
+                try:
+                    await worker.send({"type": "release", "session": session})
+                except (ConnectionError, OSError):
+                    worker.mark_down()
+
+    async def stop(self):
+        if self.health_task:
+            self.health_task.cancel()
+        for worker in self.workers:
+            await worker.close()
+
+    def stats(self) -> List[Dict]:
+        return [
+            {
+                "address": w.address,
+                "healthy": w.healthy,
+                "pid": w.pid,
+                "classes": sorted(w.classes),
+                "in_flight": len(w.pending),
+            }
+            for w in self.workers
+        ]
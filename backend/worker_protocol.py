@@ -0,0 +1,62 @@
+"""
+Framing shared by the server and node workers.
+
+Every frame is an 8 byte prefix (header length, payload length as unsigned
+big-endian ints), a JSON header describing the frame and an optional binary
+payload holding pickled arguments or results, so large values are never
+base64 or JSON encoded on the way through.
+"""
+
+import asyncio
+import json
+import pickle
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+PREFIX = struct.Struct("!II")
+MAX_HEADER_SIZE = 1024 * 1024
+
+
+async def write_frame(
+    writer: asyncio.StreamWriter, header: Dict, payload: bytes = b""
+):
+    header_bytes = json.dumps(header).encode()
+    writer.write(PREFIX.pack(len(header_bytes), len(payload)))
+    writer.write(header_bytes)
+    if payload:
+        writer.write(payload)
+    await writer.drain()
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Dict, bytes]:
+    header_size, payload_size = PREFIX.unpack(await reader.readexactly(PREFIX.size))
+    if header_size > MAX_HEADER_SIZE:
+        raise ValueError(f"Frame header of {header_size} bytes is too large")
+    header = json.loads(await reader.readexactly(header_size))
+    payload = await reader.readexactly(payload_size) if payload_size else b""
+    return header, payload
+
+
+def dump_payload(value: Any) -> bytes:
+    return pickle.dumps(value, protocol=5)
+
+
+def load_payload(payload: bytes) -> Any:
+    return pickle.loads(payload) if payload else None
+
+
+def parse_address(address: str) -> Tuple[str, Optional[str], Optional[int]]:
+    """'unix:///tmp/w.sock' -> ('unix', path, None), 'tcp://host:port' -> ('tcp', host, port)"""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://") :], None
+    if address.startswith("tcp://"):
+        address = address[len("tcp://") :]
+    host, port = address.rsplit(":", 1)
+    return "tcp", host, int(port)
+
+
+async def open_connection(address: str):
+    kind, host, port = parse_address(address)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(host)
+    return await asyncio.open_connection(host, port)
@@ -92,6 +92,15 @@ const FlowContent = () => {
                 }
               }
             };
+          } else if (type === 'iteration') {
+            // Loop progress, throttled by the backend
+            return {
+              ...node,
+              data: {
+                ...node.data,
+                iteration: data
+              }
+            };
           } else if (type === 'widget_update_options') {
             return {
               ...node,
@@ -125,7 +134,10 @@ const FlowContent = () => {
     );
 
     const isTypeCompatible = (sourceType, targetType) => {
-      return sourceType === targetType;
+      // A List output may feed an input of its element type (map mode)
+      const listMatch = sourceType.match(/^typing\.List\[(.+)\]$/);
+      const elementType = listMatch && `<class '${listMatch[1].split('.').pop()}'>`;
+      return sourceType === targetType || elementType === targetType;
     };
 
     if (isTypeCompatible(sourceOutput.type, targetInput.type)) {
@@ -7,7 +7,10 @@ export const useWebSocket = (handleNodeMessage) => {
   const reconnectTimeoutRef = useRef(null);
 
   const connectWebSocket = useCallback(() => {
-    const WS_URL = `ws://${window.location.hostname}:3000/ws`;
+    // Reuse the server session so a refresh or reconnect gets the warm graph back
+    const sessionId = sessionStorage.getItem('nodeSessionId');
+    const WS_URL = `ws://${window.location.hostname}:3000/ws` +
+      (sessionId ? `?session_id=${encodeURIComponent(sessionId)}` : '');
     const ws = new WebSocket(WS_URL);
 
     ws.onopen = () => {
@@ -36,6 +39,29 @@ export const useWebSocket = (handleNodeMessage) => {
           case 'error':
             toast.error(message.data)
             break;
+          case 'session':
+            sessionStorage.setItem('nodeSessionId', message.data.session_id);
+            break;
+          case 'run_stats':
+            console.log('Run stats:', message.data);
+            break;
+          case 'nodes_pruned':
+            console.log('Skipped nodes not feeding any output:', message.data.pruned);
+            break;
+          case 'scheduler_stats':
+            console.log('Scheduler stats:', message.data);
+            break;
+          case 'node_outcomes':
+            // Failed nodes only stop their descendants, the rest of the flow still ran
+            Object.entries(message.data)
+              .filter(([, outcome]) => outcome.status === 'failed')
+              .forEach(([nodeId, outcome]) => toast.error(`Node ${nodeId} failed: ${outcome.error}`));
+            console.log('Node outcomes:', message.data);
+            break;
+          case 'flow_superseded':
+            // A newer process_flow arrived before this one started, only the newest runs
+            console.log('Flow superseded:', message.data);
+            break;
           default:
             const errorMessage = `Unknown message type: ${event.data}`
             toast.error(errorMessage);
@@ -197,6 +197,7 @@ function PythonNode({ id, data, onWidgetValuesChange }) {
           zIndex: -1
         }}>
           {data.label}
+          {data.iteration && ` (${data.iteration.iteration}/${data.iteration.max_iterations})`}
         </div>
 
         <div style={{ position: 'relative' }}>